@@ -2,19 +2,154 @@
 # all of its dependents are notified and updated automatically.
 
 
-import uuid
+import itertools
+import json
 import random
-from time import sleep
+import weakref
+from array import array
+from operator import methodcaller
+from threading import Lock
+from time import perf_counter_ns, sleep
+from typing import Dict, Iterable, Optional, Tuple
 
 
 class Observer:
+    # a cheap, process-wide, monotonically increasing id (`next` on an itertools.count is atomic in CPython).
+    _ids = itertools.count()
 
     def __init__(self):
-        self.uuid = uuid.uuid4()
+        self.observer_id: int = next(Observer._ids)
 
     def update(self, temperature: float, humidity: float, pressure: float):
         raise NotImplementedError
 
+    def update_batch(self, temperatures: memoryview, humidities: memoryview, pressures: memoryview) -> None:
+        """Receives a whole block of measurements at once, as read-only views over the columns given to the subject.
+        Observers which only care about the latest value do not need to override this: by default, only the last
+        measurement of the block is forwarded to `update`."""
+        self.update(temperature=temperatures[-1], humidity=humidities[-1], pressure=pressures[-1])
+
+
+class LatencyHistogram:
+    """Counts latencies (in nanoseconds) in buckets of bounded relative width, in the style of HdrHistogram:
+    below 2 ** SUB_BUCKET_BITS nanoseconds, each bucket holds a single value; above, each power of two is split into
+    2 ** SUB_BUCKET_BITS buckets of equal width. The relative error of the percentiles is therefore at most 1/16,
+    and recording a value costs a couple of integer operations, whatever the number of values recorded.
+    The buckets are sparse (only those which hold a value exist), since the latencies of an observer usually fall in
+    a handful of them: a histogram per observer stays small even with many observers."""
+    SUB_BUCKET_BITS: int = 4
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.minimum: Optional[int] = None
+        self.maximum: Optional[int] = None
+
+    @classmethod
+    def _bucket(cls, value: int) -> int:
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS - 1
+        if shift < 0:
+            return value
+        return ((shift + 1) << cls.SUB_BUCKET_BITS) + (value >> shift) - (1 << cls.SUB_BUCKET_BITS)
+
+    @classmethod
+    def _highest_value_in(cls, bucket: int) -> int:
+        shift = (bucket >> cls.SUB_BUCKET_BITS) - 1
+        if shift < 0:
+            return bucket
+        sub_bucket = (bucket & ((1 << cls.SUB_BUCKET_BITS) - 1)) + (1 << cls.SUB_BUCKET_BITS)
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        bucket = self._bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def percentile(self, percent: float) -> int:
+        """An upper bound of the given percentile, within the resolution of the buckets."""
+        if self.count == 0:
+            raise ValueError("No latency has been recorded.")
+        rank = max(int(-(-percent * self.count // 100)), 1)
+        seen = 0
+        for bucket, count in sorted(self.counts.items()):
+            seen += count
+            if seen >= rank:
+                return min(self._highest_value_in(bucket), self.maximum)
+        return self.maximum
+
+    def to_dict(self) -> dict:
+        if self.count == 0:
+            return {"count": 0}
+        percentiles = {f"p{percent}_ns": self.percentile(percent) for percent in (50, 90, 99, 99.9)}
+        return {"count": self.count, "mean_ns": self.total / self.count, "min_ns": self.minimum,
+                "max_ns": self.maximum, **percentiles}
+
+
+class NotificationStats:
+    """The latencies of the `update` of each observer, and of each whole fan-out (i.e., one `notify_observers`).
+    The histogram of an observer is dropped once the observer has been garbage collected, so that short-lived
+    observers do not accumulate."""
+
+    def __init__(self):
+        self.updates: Dict[int, LatencyHistogram] = {}
+        self.fan_outs = LatencyHistogram()
+        self.notified_observers = 0
+        # subjects such as ThreadPoolWeatherData update their observers from several threads at once.
+        self._lock = Lock()
+        # the ids of the observers collected since the last pruning. The finalizers only append to this list (which
+        # needs no lock): they can run at any time, e.g. while the lock is held or `updates` is being iterated over.
+        self._collected: list = []
+
+    @staticmethod
+    def _observer_collected(stats_reference: weakref.ref, observer_id: int) -> None:
+        stats = stats_reference()
+        if stats is not None:
+            stats._collected.append(observer_id)
+
+    def _prune(self) -> None:
+        # must be called with the lock held
+        while self._collected:
+            self.updates.pop(self._collected.pop(), None)
+
+    def record_update(self, observer: Observer, latency: int) -> None:
+        with self._lock:
+            self._prune()
+            histogram = self.updates.get(observer.observer_id)
+            if histogram is None:
+                histogram = self.updates[observer.observer_id] = LatencyHistogram()
+                weakref.finalize(observer, NotificationStats._observer_collected, weakref.ref(self),
+                                 observer.observer_id)
+            histogram.record(latency)
+
+    def record_fan_out(self, latency: int, observer_count: int) -> None:
+        with self._lock:
+            self.fan_outs.record(latency)
+            self.notified_observers += observer_count
+
+    def slowest_observers(self, count: int = 10, percent: float = 99) -> list:
+        """The ids of the observers with the slowest updates at the given percentile, slowest first."""
+        with self._lock:
+            self._prune()
+            latencies = [(histogram.percentile(percent), observer_id)
+                         for observer_id, histogram in self.updates.items()]
+        return [observer_id for _, observer_id in sorted(latencies, reverse=True)[:count]]
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            self._prune()
+            return {"fan_outs": self.fan_outs.to_dict(), "notified_observers": self.notified_observers,
+                    "updates": {str(observer_id): histogram.to_dict()
+                                for observer_id, histogram in self.updates.items()}}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
 
 class Subject:
     """The only thing that the subject knows about an observer is that it implements a certain interface.
@@ -34,6 +169,36 @@ class Subject:
     def notify_observers(self):
         raise NotImplementedError
 
+    # Instrumentation is opt-in: while it is disabled, notifying costs a single attribute check.
+    instrumentation: Optional[NotificationStats] = None
+
+    def enable_instrumentation(self) -> NotificationStats:
+        if self.instrumentation is None:
+            self.instrumentation = NotificationStats()
+        return self.instrumentation
+
+    def disable_instrumentation(self) -> None:
+        self.instrumentation = None
+
+    def _notify(self, observers: Iterable[Observer], method: str, **measurements) -> None:
+        """Calls `method` (e.g., "update") on each observer with the `measurements`, recording the latencies if the
+        instrumentation is enabled. The subjects only choose which observers to notify, and of what."""
+        deliver = methodcaller(method, **measurements)
+        stats = self.instrumentation
+        if stats is None:
+            for observer in observers:
+                deliver(observer)
+            return
+
+        observer_count = 0
+        fan_out_start = perf_counter_ns()
+        for observer in observers:
+            start = perf_counter_ns()
+            deliver(observer)
+            stats.record_update(observer=observer, latency=perf_counter_ns() - start)
+            observer_count += 1
+        stats.record_fan_out(latency=perf_counter_ns() - fan_out_start, observer_count=observer_count)
+
 
 class Display:
 
@@ -69,21 +234,27 @@ class WeatherData(Subject):
 
     def __init__(self):
         # having chosen a concrete data type to store the observers, one can now implement the remaining methods.
-        self.observers: dict = {}
+        # Only weak references to the observers are kept: an observer which is dropped everywhere else is garbage
+        # collected, and its entry disappears from the registry, without anyone having to call `remove_observer`.
+        self.observers: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
         self.temperature: float = 0.0
         self.humidity: float = 0.0
         self.pressure: float = 0.0
+        # the columns of the last batch of measurements, see `set_measurements_batch`.
+        self.temperatures: memoryview = memoryview(b"").cast("d")
+        self.humidities: memoryview = memoryview(b"").cast("d")
+        self.pressures: memoryview = memoryview(b"").cast("d")
 
     def register_observer(self, observer: Observer) -> None:
-        self.observers[observer.uuid] = observer
+        self.observers[observer.observer_id] = observer
 
     def remove_observer(self, observer: Observer) -> None:
-        if observer.uuid in self.observers.keys():
-            self.observers.pop(observer.uuid)
+        if observer.observer_id in self.observers:
+            self.observers.pop(observer.observer_id)
 
     def notify_observers(self) -> None:
-        for observer in self.observers.values():
-            observer.update(temperature=self.temperature, humidity=self.humidity, pressure=self.pressure)
+        self._notify(self.observers.values(), "update", temperature=self.temperature, humidity=self.humidity,
+                     pressure=self.pressure)
         print("Observers have been notified.")
 
     def measurements_changed(self) -> None:
@@ -98,37 +269,81 @@ class WeatherData(Subject):
         print("New measurements have been set.")
         self.measurements_changed()
 
+    def notify_observers_batch(self) -> None:
+        self._notify(self.observers.values(), "update_batch", temperatures=self.temperatures,
+                     humidities=self.humidities, pressures=self.pressures)
+        print("Observers have been notified of a batch of measurements.")
+
+    def set_measurements_batch(self, temperatures, humidities, pressures) -> None:
+        """Sets a whole block of measurements at once. The columns can be NumPy arrays, `array.array`s or any other
+        object supporting the buffer protocol: they are wrapped in read-only memoryviews, so no data is copied,
+        and each observer is notified once per batch instead of once per measurement."""
+        columns = [memoryview(column).toreadonly() for column in (temperatures, humidities, pressures)]
+        for column in columns:
+            if column.ndim != 1:
+                raise ValueError("Measurement columns must be one-dimensional.")
+        if len({len(column) for column in columns}) != 1:
+            raise ValueError("Measurement columns must all have the same length.")
+        if len(columns[0]) == 0:
+            raise ValueError("At least one measurement must be provided.")
+
+        self.temperatures, self.humidities, self.pressures = columns
+        # the latest values are kept up to date, so that the subject can still be queried as before.
+        self.temperature = self.temperatures[-1]
+        self.humidity = self.humidities[-1]
+        self.pressure = self.pressures[-1]
+
+        print(f"A batch of {len(self.temperatures)} measurements has been set.")
+        self.notify_observers_batch()
+
 
 class WeatherStation:
     def __init__(self):
         self.weather_data = WeatherData()
 
-    def generate_measurements(self):
-        GenericDisplay(weather_data=self.weather_data)
-
-        for i in range(1, 5):
-            temperature = random.uniform(10, 20)
-            humidity = random.uniform(50, 100)
-            pressure = random.uniform(1.1, 1.5)
-            self.weather_data.set_measurements(temperature=temperature, humidity=humidity, pressure=pressure)
-            print(self.weather_data.observers)
-            sleep(1)
+    def generate_measurements(self, chunks: Optional[Iterable[Tuple[memoryview, memoryview, memoryview]]] = None):
+        """Without `chunks`, four random measurements are generated, one second apart.
+        Otherwise, `chunks` yields the temperatures, humidities and pressures of blocks of measurements,
+        for example replayed from one of the sources in 'weather_sources.py'."""
+        # the weather data only holds a weak reference to the display, so it must be kept alive here
+        display = GenericDisplay(weather_data=self.weather_data)
+
+        if chunks is None:
+            for i in range(1, 5):
+                temperature = random.uniform(10, 20)
+                humidity = random.uniform(50, 100)
+                pressure = random.uniform(1.1, 1.5)
+                self.weather_data.set_measurements(temperature=temperature, humidity=humidity, pressure=pressure)
+                print(dict(self.weather_data.observers))
+                sleep(1)
+        else:
+            for temperatures, humidities, pressures in chunks:
+                self.weather_data.set_measurements_batch(temperatures=temperatures, humidities=humidities,
+                                                         pressures=pressures)
+        self.weather_data.remove_observer(observer=display)
 
 
 if __name__ == '__main__':
     montana_weather_data = WeatherData()
 
     montana_obs = None
+    montana_displays = []
 
     # add two observers
     for _ in range(1, 3):
         montana_obs = GenericDisplay(weather_data=montana_weather_data)
+        montana_displays.append(montana_obs)
 
-    print(montana_weather_data.observers)
+    print(dict(montana_weather_data.observers))
     assert montana_obs is not None
 
     montana_weather_data.remove_observer(observer=montana_obs)  # remove the last added observer
-    print(montana_weather_data.observers)
+    print(dict(montana_weather_data.observers))
+    assert len(montana_weather_data.observers) == 1
+
+    # an observer which is not referenced anywhere else is dropped from the registry automatically
+    GenericDisplay(weather_data=montana_weather_data)
+    assert len(montana_weather_data.observers) == 1
 
     # initial weather values
     montana_weather_data.set_measurements(temperature=15.0, humidity=85.3, pressure=1.1)
@@ -136,5 +351,27 @@ if __name__ == '__main__':
     assert ([observer.temperature for observer in montana_weather_data.observers.values()] ==
             [15.0] * len(montana_weather_data.observers))
 
+    # a whole block of measurements is set at once, and each observer is notified only once
+    montana_weather_data.set_measurements_batch(temperatures=array("d", [15.0, 16.5, 17.2]),
+                                                humidities=array("d", [85.3, 84.0, 80.1]),
+                                                pressures=array("d", [1.1, 1.2, 1.3]))
+    # observers which do not override `update_batch` only receive the latest measurement
+    assert ([observer.temperature for observer in montana_weather_data.observers.values()] ==
+            [17.2] * len(montana_weather_data.observers))
+    assert montana_weather_data.temperatures.tolist() == [15.0, 16.5, 17.2]
+
+    # the latencies of the notifications can be recorded, and exported as JSON
+    stats = montana_weather_data.enable_instrumentation()
+    montana_weather_data.set_measurements(temperature=16.0, humidity=80.0, pressure=1.2)
+    assert stats.fan_outs.count == 1 and stats.notified_observers == 1
+    assert list(stats.updates) == [montana_displays[0].observer_id]
+    print(stats.to_json())
+    # the latencies of the observers which have been garbage collected are dropped
+    for _ in range(1000):
+        GenericDisplay(weather_data=montana_weather_data)
+        montana_weather_data.set_measurements(temperature=16.0, humidity=80.0, pressure=1.2)
+    assert list(stats.to_dict()["updates"]) == [str(montana_displays[0].observer_id)]
+    montana_weather_data.disable_instrumentation()
+
     weather_station = WeatherStation()
     weather_station.generate_measurements()
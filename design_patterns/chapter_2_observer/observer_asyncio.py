@@ -0,0 +1,232 @@
+# An asyncio version of the weather subject in 'observer.py'.
+# In 'observer.py', `notify_observers` calls each observer in turn, so a single slow observer stalls both the subject
+# and every other observer. Here, each observer gets its own bounded queue, which is drained by its own task:
+# the subject only has to put the new measurements in the queues, and the observers are updated concurrently.
+
+import asyncio
+import inspect
+import weakref
+from time import perf_counter_ns
+from typing import Dict, Tuple
+
+from observer import Observer, Subject, GenericDisplay
+
+DROP_OLDEST = "drop-oldest"
+DROP_NEWEST = "drop-newest"
+BLOCK = "block"
+_OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class AsyncObserver(Observer):
+    """Observers can either implement `update` as a coroutine, as below,
+    or as a plain function (e.g., GenericDisplay)."""
+
+    async def update(self, temperature: float, humidity: float, pressure: float):
+        raise NotImplementedError
+
+
+class AsyncWeatherData(Subject):
+    """Each observer is fed through its own queue, holding at most `max_queue_size` measurements.
+    When the queue of an observer is full, the `overflow_policy` decides what happens to a new measurement:
+    - "drop-oldest": the oldest measurement waiting in the queue is discarded to make room for the new one;
+    - "drop-newest": the new measurement is discarded;
+    - "block": the subject waits until there is room in the queue (i.e., the slowest observer sets the pace).
+    """
+
+    def __init__(self, max_queue_size: int = 64, overflow_policy: str = DROP_OLDEST):
+        if overflow_policy not in _OVERFLOW_POLICIES:
+            raise ValueError(f"Overflow policy {overflow_policy} is not supported.")
+        if max_queue_size < 1:
+            raise ValueError("The queues must be able to hold at least one measurement.")
+
+        self.observers: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+        self.max_queue_size = max_queue_size
+        self.overflow_policy = overflow_policy
+        self.temperature: float = 0.0
+        self.humidity: float = 0.0
+        self.pressure: float = 0.0
+
+        self._queues: Dict[int, asyncio.Queue] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._dropped: Dict[int, int] = {}
+        self._failures: Dict[int, int] = {}
+
+    def register_observer(self, observer: Observer) -> None:
+        # the queue is created right away, but the task draining it only once there is a running event loop,
+        # so that observers can still be registered outside of a coroutine (e.g., in GenericDisplay.__init__).
+        self.observers[observer.observer_id] = observer
+        if observer.observer_id not in self._queues:
+            self._queues[observer.observer_id] = asyncio.Queue(maxsize=self.max_queue_size)
+            self._dropped[observer.observer_id] = 0
+
+    def remove_observer(self, observer: Observer) -> None:
+        if observer.observer_id in self.observers:
+            self.observers.pop(observer.observer_id)
+            self._discard(key=observer.observer_id)
+
+    def _discard(self, key: int) -> None:
+        queue = self._queues.pop(key, None)
+        # the pending measurements are marked as processed, so that nobody waits on them in `join`.
+        while queue is not None and not queue.empty():
+            queue.get_nowait()
+            queue.task_done()
+        self._dropped.pop(key, None)
+        self._failures.pop(key, None)
+        worker = self._workers.pop(key, None)
+        if worker is not None and worker is not asyncio.current_task():
+            worker.cancel()
+
+    async def _drain(self, key: int, queue: asyncio.Queue) -> None:
+        while True:
+            temperature, humidity, pressure = await queue.get()
+            try:
+                observer = self.observers.get(key)
+                if observer is None:
+                    # the observer has been garbage collected: its queue and this task are no longer needed.
+                    self._discard(key=key)
+                    return
+                stats = self.instrumentation
+                start = perf_counter_ns()
+                try:
+                    result = observer.update(temperature=temperature, humidity=humidity, pressure=pressure)
+                    del observer
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as exception:
+                    # there is no caller to propagate the exception to, and the queue must keep being drained,
+                    # or `join` and `close` (and `set_measurements`, with the "block" policy) would wait forever.
+                    observer = None
+                    self._failures[key] = self._failures.get(key, 0) + 1
+                    print(f"Observer {key} failed to update: {exception!r}")
+                    continue
+                latency = perf_counter_ns() - start
+                observer = self.observers.get(key)
+                if stats is not None and observer is not None:
+                    stats.record_update(observer=observer, latency=latency)
+                del observer
+            finally:
+                queue.task_done()
+
+    def _start_workers(self) -> None:
+        for key in [key for key in self._queues if key not in self.observers]:
+            self._discard(key=key)
+        for key, queue in self._queues.items():
+            if key not in self._workers:
+                self._workers[key] = asyncio.get_running_loop().create_task(self._drain(key=key, queue=queue))
+
+    async def _enqueue(self, key: int, queue: asyncio.Queue, measurements: Tuple[float, float, float]) -> None:
+        if not queue.full():
+            queue.put_nowait(measurements)
+        elif self.overflow_policy == DROP_OLDEST:
+            queue.get_nowait()
+            queue.task_done()
+            queue.put_nowait(measurements)
+            self._dropped[key] += 1
+        elif self.overflow_policy == DROP_NEWEST:
+            self._dropped[key] += 1
+        else:
+            await queue.put(measurements)
+
+    async def notify_observers(self) -> None:
+        # when instrumented, the fan-out only measures the handing over of the measurements to the queues
+        stats = self.instrumentation
+        fan_out_start = perf_counter_ns()
+        self._start_workers()
+        measurements = (self.temperature, self.humidity, self.pressure)
+        await asyncio.gather(*[self._enqueue(key=key, queue=queue, measurements=measurements)
+                               for key, queue in list(self._queues.items())])
+        if stats is not None:
+            stats.record_fan_out(latency=perf_counter_ns() - fan_out_start, observer_count=len(self._queues))
+
+    async def set_measurements(self, temperature: float, humidity: float, pressure: float) -> None:
+        self.temperature = temperature
+        self.humidity = humidity
+        self.pressure = pressure
+        await self.notify_observers()
+
+    async def join(self) -> None:
+        """Waits until every measurement handed to the observers so far has been processed."""
+        self._start_workers()
+        await asyncio.gather(*[queue.join() for queue in list(self._queues.values())])
+
+    async def close(self) -> None:
+        """Processes the pending measurements and stops the tasks draining the queues."""
+        await self.join()
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._workers.clear()
+
+    def queue_depths(self) -> Dict[int, int]:
+        """The number of measurements waiting to be processed, per observer."""
+        return {key: queue.qsize() for key, queue in self._queues.items()}
+
+    def dropped_counts(self) -> Dict[int, int]:
+        """The number of measurements discarded because of the overflow policy, per observer."""
+        return dict(self._dropped)
+
+    def failure_counts(self) -> Dict[int, int]:
+        """The number of updates which raised an exception, per observer (only observers which failed are listed)."""
+        return dict(self._failures)
+
+
+class SlowDisplay(AsyncObserver):
+
+    def __init__(self, weather_data: Subject, delay: float):
+        super().__init__()
+        self.delay = delay
+        self.temperatures: list = []
+
+        weather_data.register_observer(self)
+
+    async def update(self, temperature: float, humidity: float, pressure: float) -> None:
+        await asyncio.sleep(self.delay)
+        self.temperatures.append(temperature)
+
+
+class FaultyDisplay(SlowDisplay):
+
+    async def update(self, temperature: float, humidity: float, pressure: float) -> None:
+        await super().update(temperature=temperature, humidity=humidity, pressure=pressure)
+        if temperature % 2 == 0:
+            raise RuntimeError(f"Cannot display {temperature}")
+
+
+async def main() -> None:
+    weather_data = AsyncWeatherData(max_queue_size=2, overflow_policy=DROP_OLDEST)
+
+    slow_display = SlowDisplay(weather_data=weather_data, delay=0.1)
+    fast_display = SlowDisplay(weather_data=weather_data, delay=0.0)
+    # synchronous observers keep working as before
+    generic_display = GenericDisplay(weather_data=weather_data)
+
+    for temperature in range(5):
+        await weather_data.set_measurements(temperature=float(temperature), humidity=85.3, pressure=1.1)
+        await asyncio.sleep(0)
+    print(weather_data.queue_depths())
+
+    await weather_data.close()
+    print(weather_data.dropped_counts())
+
+    # the slow display could not keep up, so some measurements were dropped, but the fast display got all of them
+    assert fast_display.temperatures == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert slow_display.temperatures[-1] == 4.0
+    assert weather_data.dropped_counts()[slow_display.observer_id] > 0
+    assert generic_display.temperature == 4.0
+
+    weather_data.remove_observer(observer=slow_display)
+    assert slow_display.observer_id not in weather_data.queue_depths()
+
+    # an observer whose update raises keeps being updated, and its failures are counted
+    blocking_weather_data = AsyncWeatherData(max_queue_size=1, overflow_policy=BLOCK)
+    faulty_display = FaultyDisplay(weather_data=blocking_weather_data, delay=0.0)
+    for temperature in range(4):
+        await blocking_weather_data.set_measurements(temperature=float(temperature), humidity=85.3, pressure=1.1)
+    await asyncio.wait_for(blocking_weather_data.close(), timeout=5)
+    assert faulty_display.temperatures == [0.0, 1.0, 2.0, 3.0]
+    assert blocking_weather_data.failure_counts() == {faulty_display.observer_id: 2}
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+# Benchmarks for the weather subjects in this chapter.
+# The subjects print whenever measurements are set, so their output is silenced while measuring.
+
+import contextlib
+import gc
+import io
+import tracemalloc
+import uuid
+from time import perf_counter
+
+from observer import Observer, WeatherData
+from observer_thread_pool import BlockingDisplay, ThreadPoolWeatherData
+
+
+def benchmark_thread_pool(observer_counts=(1, 10, 1_000), delay: float = 0.001, notifications: int = 5,
+                          max_workers: int = 64) -> None:
+    """Compares the notify throughput of the serial loop in `WeatherData` with `ThreadPoolWeatherData`,
+    for observers which block for `delay` seconds on each update. The thread pool should be faster by about the number
+    of observers, up to `max_workers`."""
+    print(f"Notify throughput with observers blocking for {delay * 1000:.1f} ms per update:")
+    for observer_count in observer_counts:
+        results = {}
+        for name, weather_data in (("serial", WeatherData()),
+                                   ("thread pool", ThreadPoolWeatherData(max_workers=max_workers))):
+            # the subjects only hold weak references: the displays are kept alive for the whole run
+            displays = [BlockingDisplay(weather_data=weather_data, delay=delay) for _ in range(observer_count)]
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = perf_counter()
+                for temperature in range(notifications):
+                    weather_data.set_measurements(temperature=float(temperature), humidity=85.3, pressure=1.1)
+                if isinstance(weather_data, ThreadPoolWeatherData):
+                    weather_data.shutdown()
+                elapsed = perf_counter() - start
+            assert all(len(display.temperatures) == notifications for display in displays)
+            results[name] = notifications / elapsed
+
+        speedup = results["thread pool"] / results["serial"]
+        expected = min(observer_count, max_workers)
+        print(f"{observer_count:>6} observers: serial {results['serial']:10.2f} notifications/s, "
+              f"thread pool {results['thread pool']:10.2f} notifications/s (x{speedup:.1f}, at best x{expected})")
+        assert speedup > expected / 2, f"The thread pool is only x{speedup:.1f} faster with {observer_count} observers."
+
+
+class UUIDObserver:
+    """The observer as it used to be: identified by a random UUID and held through a strong reference."""
+
+    def __init__(self):
+        self.uuid = uuid.uuid4()
+
+    def update(self, temperature: float, humidity: float, pressure: float) -> None:
+        pass
+
+
+class NullObserver(Observer):
+
+    def update(self, temperature: float, humidity: float, pressure: float) -> None:
+        pass
+
+
+def benchmark_registry(observer_count: int = 1_000_000) -> None:
+    """Compares the construction time and memory of `observer_count` observers registered with a subject,
+    between UUID ids with strong references and integer ids with weak references."""
+    print(f"Constructing and registering {observer_count} observers:")
+
+    def measure(name: str, make_observers) -> None:
+        gc.collect()
+        start = perf_counter()
+        subject, observers = make_observers()
+        elapsed = perf_counter() - start
+        del subject, observers
+
+        # the memory is measured on a separate run, since tracemalloc slows the construction down considerably
+        gc.collect()
+        tracemalloc.start()
+        subject, observers = make_observers()
+        memory, _ = tracemalloc.get_traced_memory()
+        del observers
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:>20}: {elapsed:6.2f} s, {memory / observer_count:6.1f} bytes per observer, "
+              f"{retained / observer_count:6.1f} bytes per observer retained after dropping them")
+
+    def uuid_registry():
+        subject = {}
+        observers = [UUIDObserver() for _ in range(observer_count)]
+        for observer in observers:
+            subject[observer.uuid] = observer
+        return subject, observers
+
+    def weak_registry():
+        subject = WeatherData()
+        observers = [NullObserver() for _ in range(observer_count)]
+        for observer in observers:
+            subject.register_observer(observer)
+        return subject, observers
+
+    measure("uuid, strong refs", uuid_registry)
+    measure("integer, weak refs", weak_registry)
+
+
+if __name__ == '__main__':
+    benchmark_thread_pool()
+    benchmark_registry()
@@ -0,0 +1,297 @@
+# A version of the weather subject in 'observer.py' where observers can subscribe to the measurements they care about.
+# Instead of waking every observer on every update, observers register with declarative filters (thresholds, deltas
+# and ranges on a given field), and the subject keeps these filters in sorted indexes per field.
+# An update then only visits the filters whose boundaries were crossed, plus the observers it actually notifies:
+# the cost of a notification scales with the number of *interested* observers, not with the total number of observers.
+# The filters of an observer are dropped once it has been garbage collected, even if none of them ever matches again.
+
+import weakref
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, List, Set, Tuple
+
+from observer import Observer, WeatherData
+
+FIELDS = ("temperature", "humidity", "pressure")
+
+
+class MeasurementFilter:
+
+    def __init__(self, field: str):
+        if field not in FIELDS:
+            raise ValueError(f"Field {field} is not supported.")
+        self.field = field
+
+
+class Threshold(MeasurementFilter):
+    """Matches when the field crosses `value`: going up means from below `value` to at least `value`,
+    and going down means from at least `value` to below `value`."""
+
+    def __init__(self, field: str, value: float, direction: str = "both"):
+        super().__init__(field=field)
+        if direction not in ("up", "down", "both"):
+            raise ValueError(f"Direction {direction} is not supported.")
+        self.value = value
+        self.direction = direction
+
+    def crossed(self, previous: float, current: float) -> bool:
+        going_up = previous < self.value <= current
+        going_down = current < self.value <= previous
+        return ((going_up and self.direction != "down") or
+                (going_down and self.direction != "up"))
+
+
+class Delta(MeasurementFilter):
+    """Matches when the field moves by more than `amount` since the last time this filter matched
+    (or since the observer registered). If `relative`, `amount` is a fraction of that last value, e.g. 0.05 for 5%."""
+
+    def __init__(self, field: str, amount: float, relative: bool = False):
+        super().__init__(field=field)
+        if amount < 0:
+            raise ValueError("The amount of a delta cannot be negative.")
+        self.amount = amount
+        self.relative = relative
+
+    def band(self, reference: float) -> Tuple[float, float]:
+        width = self.amount * abs(reference) if self.relative else self.amount
+        return reference - width, reference + width
+
+
+class Range(MeasurementFilter):
+    """Matches whenever the field lies between `low` and `high` (both included)."""
+
+    def __init__(self, field: str, low: float, high: float):
+        super().__init__(field=field)
+        if low > high:
+            raise ValueError("The lower bound of a range cannot be above its upper bound.")
+        self.low = low
+        self.high = high
+
+
+class _FieldIndex:
+    """Keeps the filters on one field sorted by their boundaries, each filter being identified by an integer key.
+    Thresholds have one boundary, ranges and deltas two. A filter can only change its outcome when the field crosses
+    one of its boundaries, so an update from `previous` to `current` only needs to look at the boundaries in between.
+
+    New boundaries are only merged into the sorted list on the next update, and the boundaries of removed filters
+    (or the old band of a re-centered delta) are left behind until they make up half of the list:
+    this keeps registering and removing many observers cheap."""
+
+    def __init__(self):
+        self.boundaries: List[Tuple[float, int]] = []
+        self.filters: Dict[int, MeasurementFilter] = {}
+        # the ranges which contain the current value, and the current band of each delta.
+        self.inside: Set[int] = set()
+        self.bands: Dict[int, Tuple[float, float]] = {}
+        self._pending: List[Tuple[float, int]] = []
+        self._stale = 0
+
+    def _boundaries_of(self, key: int) -> Tuple[float, ...]:
+        measurement_filter = self.filters[key]
+        if isinstance(measurement_filter, Threshold):
+            return measurement_filter.value,
+        if isinstance(measurement_filter, Range):
+            return measurement_filter.low, measurement_filter.high
+        return self.bands[key]
+
+    def _is_current(self, boundary: float, key: int) -> bool:
+        return key in self.filters and boundary in self._boundaries_of(key)
+
+    def add(self, key: int, measurement_filter: MeasurementFilter, current: float) -> None:
+        self.filters[key] = measurement_filter
+        if isinstance(measurement_filter, Range) and measurement_filter.low <= current <= measurement_filter.high:
+            self.inside.add(key)
+        elif isinstance(measurement_filter, Delta):
+            self.bands[key] = measurement_filter.band(reference=current)
+        self._pending.extend((boundary, key) for boundary in self._boundaries_of(key))
+
+    def remove(self, key: int) -> None:
+        self._stale += len(self._boundaries_of(key))
+        self.filters.pop(key)
+        self.inside.discard(key)
+        self.bands.pop(key, None)
+
+    def _recenter(self, key: int, current: float) -> None:
+        self._stale += 2
+        self.bands[key] = self.filters[key].band(reference=current)
+        self._pending.extend((boundary, key) for boundary in self.bands[key])
+
+    def _merge(self) -> None:
+        if len(self._pending) < 32:
+            for entry in self._pending:
+                insort(self.boundaries, entry)
+        else:
+            self.boundaries.extend(self._pending)
+            self.boundaries.sort()
+        self._pending.clear()
+        # after the merge, since the filters removed before it was merged also count as stale
+        if self._stale > len(self.boundaries) // 2:
+            self.boundaries = [(boundary, key) for boundary, key in self.boundaries if self._is_current(boundary, key)]
+            self._stale = 0
+
+    def matches(self, previous: float, current: float) -> Set[int]:
+        """Returns the keys of the filters matching the update of the field from `previous` to `current`."""
+        matched = set()
+        if previous != current:
+            self._merge()
+            start = bisect_left(self.boundaries, (min(previous, current), -1))
+            stop = bisect_right(self.boundaries, (max(previous, current), float("inf")))
+            # the keys are collected first, since re-centering a delta adds new boundaries
+            for key in {key for boundary, key in self.boundaries[start:stop] if self._is_current(boundary, key)}:
+                measurement_filter = self.filters[key]
+                if isinstance(measurement_filter, Threshold):
+                    if measurement_filter.crossed(previous=previous, current=current):
+                        matched.add(key)
+                elif isinstance(measurement_filter, Range):
+                    if measurement_filter.low <= current <= measurement_filter.high:
+                        self.inside.add(key)
+                    else:
+                        self.inside.discard(key)
+                else:
+                    low, high = self.bands[key]
+                    if current < low or current > high:
+                        matched.add(key)
+                        self._recenter(key=key, current=current)
+        return matched | self.inside
+
+
+class FilteredWeatherData(WeatherData):
+    """Observers registered without filters are notified of every update, as in WeatherData.
+    Observers registered with filters are only notified when at least one of their filters matches."""
+
+    def __init__(self):
+        super().__init__()
+        self._indexes: Dict[str, _FieldIndex] = {field: _FieldIndex() for field in FIELDS}
+        self._filter_keys: Dict[int, List[Tuple[str, int]]] = {}
+        self._filter_owners: Dict[int, int] = {}
+        self._next_key = 0
+        # the observers without filters are also kept on their own, so that they can be found without a full scan
+        self._unfiltered: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+        # the values the filters were last evaluated against
+        self._previous: Dict[str, float] = {field: getattr(self, field) for field in FIELDS}
+        # the finalizer of each observer with filters, and the ids of the observers collected since the last pruning
+        # (the finalizers only append to this list, since they can run at any time, e.g. in the middle of an update)
+        self._finalizers: Dict[int, weakref.finalize] = {}
+        self._collected: list = []
+
+    @staticmethod
+    def _observer_collected(subject_reference: weakref.ref, observer_id: int) -> None:
+        subject = subject_reference()
+        if subject is not None:
+            subject._collected.append(observer_id)
+
+    def _prune(self) -> None:
+        while self._collected:
+            self._remove_filters(observer_id=self._collected.pop())
+
+    def register_observer(self, observer: Observer, filters: Iterable[MeasurementFilter] = ()) -> None:
+        self._prune()
+        self.remove_observer(observer)
+        super().register_observer(observer)
+        filters = list(filters)
+        if not filters:
+            self._unfiltered[observer.observer_id] = observer
+            return
+
+        self._filter_keys[observer.observer_id] = []
+        for measurement_filter in filters:
+            key = self._next_key
+            self._next_key += 1
+            self._indexes[measurement_filter.field].add(key=key, measurement_filter=measurement_filter,
+                                                        current=self._previous[measurement_filter.field])
+            self._filter_keys[observer.observer_id].append((measurement_filter.field, key))
+            self._filter_owners[key] = observer.observer_id
+        self._finalizers[observer.observer_id] = weakref.finalize(
+            observer, FilteredWeatherData._observer_collected, weakref.ref(self), observer.observer_id)
+
+    def remove_observer(self, observer: Observer) -> None:
+        super().remove_observer(observer)
+        self._unfiltered.pop(observer.observer_id, None)
+        self._remove_filters(observer_id=observer.observer_id)
+
+    def _remove_filters(self, observer_id: int) -> None:
+        finalizer = self._finalizers.pop(observer_id, None)
+        if finalizer is not None:
+            finalizer.detach()
+        for field, key in self._filter_keys.pop(observer_id, ()):
+            self._indexes[field].remove(key=key)
+            self._filter_owners.pop(key)
+
+    def _interested_observers(self) -> List[Observer]:
+        self._prune()
+        keys = set()
+        for field, index in self._indexes.items():
+            keys |= index.matches(previous=self._previous[field], current=getattr(self, field))
+            self._previous[field] = getattr(self, field)
+
+        interested = []
+        for observer_id in {self._filter_owners[key] for key in keys}:
+            observer = self.observers.get(observer_id)
+            if observer is None:
+                # the observer has been garbage collected, so its filters are no longer needed.
+                self._remove_filters(observer_id=observer_id)
+            else:
+                interested.append(observer)
+        return interested
+
+    def _unfiltered_observers(self) -> List[Observer]:
+        return list(self._unfiltered.values())
+
+    def notify_observers(self) -> None:
+        observers = self._unfiltered_observers() + self._interested_observers()
+        self._notify(observers, "update", temperature=self.temperature, humidity=self.humidity,
+                     pressure=self.pressure)
+        print("Observers have been notified.")
+
+    def notify_observers_batch(self) -> None:
+        # the filters are evaluated once per batch, between the latest values of the previous and of this batch.
+        observers = self._unfiltered_observers() + self._interested_observers()
+        self._notify(observers, "update_batch", temperatures=self.temperatures, humidities=self.humidities,
+                     pressures=self.pressures)
+        print("Observers have been notified of a batch of measurements.")
+
+
+class CountingDisplay(Observer):
+
+    def __init__(self):
+        super().__init__()
+        self.temperatures: list = []
+
+    def update(self, temperature: float, humidity: float, pressure: float) -> None:
+        self.temperatures.append(temperature)
+
+
+if __name__ == '__main__':
+    weather_data = FilteredWeatherData()
+    weather_data.set_measurements(temperature=25.0, humidity=80.0, pressure=1.1)
+
+    every_update = CountingDisplay()
+    heat_alert = CountingDisplay()
+    humidity_swings = CountingDisplay()
+    mild_weather = CountingDisplay()
+    weather_data.register_observer(every_update)
+    weather_data.register_observer(heat_alert, filters=[Threshold(field="temperature", value=30.0, direction="up")])
+    weather_data.register_observer(humidity_swings, filters=[Delta(field="humidity", amount=0.05, relative=True)])
+    weather_data.register_observer(mild_weather, filters=[Range(field="temperature", low=15.0, high=25.0)])
+
+    for temperature, humidity in [(28.0, 81.0), (31.0, 83.0), (32.0, 86.0), (24.0, 86.5), (29.0, 91.0)]:
+        weather_data.set_measurements(temperature=temperature, humidity=humidity, pressure=1.1)
+
+    assert every_update.temperatures == [28.0, 31.0, 32.0, 24.0, 29.0]
+    # 31.0 crosses 30.0 upwards, whereas 24.0 crosses it downwards
+    assert heat_alert.temperatures == [31.0]
+    # 86.0 is more than 5% away from 80.0, and then 91.0 is more than 5% away from 86.0
+    assert humidity_swings.temperatures == [32.0, 29.0]
+    assert mild_weather.temperatures == [24.0]
+
+    weather_data.remove_observer(heat_alert)
+    weather_data.set_measurements(temperature=35.0, humidity=90.0, pressure=1.1)
+    assert heat_alert.temperatures == [31.0]
+
+    # the filters of the observers which were garbage collected go away, even those which would never match again
+    for _ in range(10_000):
+        weather_data.register_observer(CountingDisplay(), filters=[Threshold(field="temperature", value=100.0)])
+    weather_data.set_measurements(temperature=36.0, humidity=90.0, pressure=1.1)
+    temperature_index = weather_data._indexes["temperature"]
+    assert len(temperature_index.filters) == 1 and len(temperature_index.boundaries) <= 4
+    assert len(weather_data._filter_owners) == 2 and not weather_data._finalizers.keys() - {
+        heat_alert.observer_id, humidity_swings.observer_id, mild_weather.observer_id}
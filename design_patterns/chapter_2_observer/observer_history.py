@@ -0,0 +1,147 @@
+# An observer which persists every measurement of the WeatherData subject in 'observer.py'.
+# WeatherData only keeps the latest measurements, so the history is lost unless an observer records it.
+# HistoryStore appends the measurements to one file per column (timestamp, temperature, humidity, pressure), made of
+# fixed-width native doubles. The files are only ever appended to, in batches, and are memory-mapped to answer range
+# queries: the rows between two timestamps are found by bisection and returned as views over the mapping, without
+# copying anything (a view can be handed to `numpy.frombuffer` or `numpy.asarray`, which do not copy either).
+# The rows which are still buffered are flushed by `close`, or else when the store is garbage collected or the
+# interpreter exits.
+
+import mmap
+import os
+import weakref
+from array import array
+from bisect import bisect_left, bisect_right
+from time import time
+from typing import Callable, Dict, Tuple
+
+from observer import Observer, Subject
+
+COLUMNS = ("timestamp", "temperature", "humidity", "pressure")
+
+
+class HistoryStore(Observer):
+
+    def __init__(self, weather_data: Subject, directory: str, flush_size: int = 4096,
+                 clock: Callable[[], float] = time):
+        super().__init__()
+        self.weather_data = weather_data
+        self.directory = directory
+        self.flush_size = flush_size
+        self.clock = clock
+
+        os.makedirs(directory, exist_ok=True)
+        self._paths = {column: os.path.join(directory, f"{column}.f64") for column in COLUMNS}
+        self._buffers = {column: array("d") for column in COLUMNS}
+        self._mappings: Dict[str, Tuple[int, memoryview]] = {}
+        self._repair()
+        # the finalizer only holds the paths and the buffers, not the store
+        self._finalizer = weakref.finalize(self, HistoryStore._write, self._paths, self._buffers)
+
+        weather_data.register_observer(self)
+
+    def _repair(self) -> None:
+        """Drops the rows which are missing from some of the columns, e.g. if the last flush was interrupted."""
+        for path in self._paths.values():
+            open(path, "ab").close()
+        row_counts = [os.path.getsize(path) // array("d").itemsize for path in self._paths.values()]
+        for path in self._paths.values():
+            os.truncate(path, min(row_counts) * array("d").itemsize)
+
+    def __len__(self) -> int:
+        """The number of rows stored, including the ones which have not been flushed yet."""
+        return os.path.getsize(self._paths["timestamp"]) // array("d").itemsize + len(self._buffers["timestamp"])
+
+    def _append(self, timestamp: float, temperature: float, humidity: float, pressure: float) -> None:
+        for column, value in zip(COLUMNS, (timestamp, temperature, humidity, pressure)):
+            self._buffers[column].append(value)
+
+    def update(self, temperature: float, humidity: float, pressure: float) -> None:
+        self._append(timestamp=self.clock(), temperature=temperature, humidity=humidity, pressure=pressure)
+        if len(self._buffers["timestamp"]) >= self.flush_size:
+            self.flush()
+
+    def update_batch(self, temperatures: memoryview, humidities: memoryview, pressures: memoryview) -> None:
+        # the measurements of a batch are all recorded with the time at which the batch was received.
+        timestamp = self.clock()
+        self._buffers["timestamp"].extend([timestamp] * len(temperatures))
+        for column, values in zip(COLUMNS[1:], (temperatures, humidities, pressures)):
+            self._buffers[column].extend(values)
+        if len(self._buffers["timestamp"]) >= self.flush_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Appends the buffered rows to the column files. The timestamps are written last, so that a row only
+        becomes visible to the queries once all of its columns have been written."""
+        HistoryStore._write(paths=self._paths, buffers=self._buffers)
+
+    @staticmethod
+    def _write(paths: Dict[str, str], buffers: Dict[str, array]) -> None:
+        for column in reversed(COLUMNS):
+            buffer = buffers[column]
+            if len(buffer) > 0:
+                with open(paths[column], "ab") as file:
+                    buffer.tofile(file)
+                del buffer[:]
+
+    def close(self) -> None:
+        """Stops recording and flushes the rows which are still buffered."""
+        self.weather_data.remove_observer(self)
+        self.flush()
+        self._finalizer.detach()
+
+    def _column(self, column: str) -> memoryview:
+        size = os.path.getsize(self._paths[column])
+        if column not in self._mappings or self._mappings[column][0] != size:
+            if size == 0:
+                view = memoryview(b"").cast("d")
+            else:
+                with open(self._paths[column], "rb") as file:
+                    # the mapping outlives the file, and is released once no view refers to it anymore
+                    view = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)).cast("d")
+            self._mappings[column] = (size, view)
+        return self._mappings[column][1]
+
+    def query(self, column: str, start: float, end: float) -> memoryview:
+        """Returns the values of `column` measured between the timestamps `start` and `end` (both included),
+        as a read-only view over the memory-mapped file."""
+        if column not in COLUMNS:
+            raise ValueError(f"Column {column} is not supported.")
+        self.flush()
+        timestamps = self._column("timestamp")
+        # the timestamps are only ever appended, so they are sorted and the rows can be found by bisection
+        first = bisect_left(timestamps, start)
+        last = bisect_right(timestamps, end)
+        return self._column(column)[first:last]
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    from observer import WeatherData
+
+    now = [0.0]
+    weather_data = WeatherData()
+    with tempfile.TemporaryDirectory() as directory:
+        history = HistoryStore(weather_data=weather_data, directory=directory, flush_size=2, clock=lambda: now[0])
+
+        for second, pressure in enumerate([1.1, 1.2, 1.3, 1.25, 1.4]):
+            now[0] = float(second)
+            weather_data.set_measurements(temperature=15.0 + second, humidity=85.3, pressure=pressure)
+        weather_data.set_measurements_batch(temperatures=array("d", [21.0, 22.0]), humidities=array("d", [80.0, 81.0]),
+                                            pressures=array("d", [1.5, 1.6]))
+
+        assert len(history) == 7
+        assert history.query(column="pressure", start=1.0, end=3.0).tolist() == [1.2, 1.3, 1.25]
+        assert history.query(column="temperature", start=4.0, end=10.0).tolist() == [19.0, 21.0, 22.0]
+
+        # the history survives the store: a new store on the same directory carries on appending to it
+        history.close()
+        reopened = HistoryStore(weather_data=weather_data, directory=directory, clock=lambda: now[0])
+        assert reopened.query(column="humidity", start=0.0, end=10.0).tolist() == [85.3] * 5 + [80.0, 81.0]
+
+        # the rows which are still buffered when a store is dropped are not lost either
+        now[0] = 20.0
+        weather_data.set_measurements(temperature=30.0, humidity=70.0, pressure=1.0)
+        del reopened
+        assert len(HistoryStore(weather_data=weather_data, directory=directory)) == 8
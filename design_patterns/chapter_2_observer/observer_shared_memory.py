@@ -0,0 +1,184 @@
+# Fan-out of the WeatherData subject in 'observer.py' to observers living in other processes.
+# The publisher is an ordinary observer of WeatherData, which writes each measurement as a fixed-size record into a ring
+# buffer in shared memory. In the other processes, a subscriber reads the records straight from the shared memory
+# (no pickling, no pipes) and acts as the subject for the local observers, with the same `register_observer` interface.
+#
+# Layout of the shared memory: a header with the capacity of the ring and the sequence number of the last record
+# published, followed by `capacity` slots. Each slot holds the sequence number of its record, followed by the
+# temperature, humidity and pressure. Sequence numbers start at 1, and record n lives in slot (n - 1) % capacity.
+# The writer never waits for the readers: a reader which falls more than `capacity` records behind has been overrun,
+# which it detects by comparing sequence numbers, and it then skips ahead to the oldest record still available.
+
+import struct
+import weakref
+from multiprocessing import shared_memory
+from time import sleep
+from typing import Optional
+
+from observer import Observer, Subject, WeatherData
+
+_HEADER = struct.Struct("<QQ")
+_RECORD = struct.Struct("<Qddd")
+_SEQUENCE = struct.Struct("<Q")
+
+
+def _slot_offset(capacity: int, sequence: int) -> int:
+    return _HEADER.size + ((sequence - 1) % capacity) * _RECORD.size
+
+
+class SharedMemoryPublisher(Observer):
+
+    def __init__(self, weather_data: Subject, capacity: int = 4096, name: Optional[str] = None):
+        super().__init__()
+        if capacity < 1:
+            raise ValueError("The ring buffer must be able to hold at least one record.")
+        self.weather_data = weather_data
+        self.capacity = capacity
+        self.memory = shared_memory.SharedMemory(name=name, create=True,
+                                                 size=_HEADER.size + capacity * _RECORD.size)
+        self.name = self.memory.name
+        self.published = 0
+        _HEADER.pack_into(self.memory.buf, 0, capacity, 0)
+
+        weather_data.register_observer(self)
+
+    def update(self, temperature: float, humidity: float, pressure: float) -> None:
+        sequence = self.published + 1
+        offset = _slot_offset(capacity=self.capacity, sequence=sequence)
+        buffer = self.memory.buf
+        # the slot is marked as being written first, so that a reader never mistakes a half-written record for
+        # a complete one; the header is updated last, once the record is complete.
+        _SEQUENCE.pack_into(buffer, offset, 0)
+        _RECORD.pack_into(buffer, offset, 0, temperature, humidity, pressure)
+        _SEQUENCE.pack_into(buffer, offset, sequence)
+        _HEADER.pack_into(buffer, 0, self.capacity, sequence)
+        self.published = sequence
+
+    def update_batch(self, temperatures: memoryview, humidities: memoryview, pressures: memoryview) -> None:
+        for temperature, humidity, pressure in zip(temperatures, humidities, pressures):
+            self.update(temperature=temperature, humidity=humidity, pressure=pressure)
+
+    def close(self) -> None:
+        """Stops publishing and frees the shared memory (subscribers which are still attached keep their mapping)."""
+        self.weather_data.remove_observer(self)
+        self.memory.close()
+        self.memory.unlink()
+
+
+class SharedMemorySubscriber(Subject):
+    """The subject of the observers in a consumer process. The records published since the last call to `poll`
+    are delivered to the observers in order, one `update` per record."""
+
+    def __init__(self, name: str):
+        self.memory = shared_memory.SharedMemory(name=name)
+        self.capacity, published = _HEADER.unpack_from(self.memory.buf, 0)
+        self.observers: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+        # new subscribers start with the next record to be published
+        self.last_sequence = published
+        self.overruns = 0
+        self.temperature: float = 0.0
+        self.humidity: float = 0.0
+        self.pressure: float = 0.0
+
+    def register_observer(self, observer: Observer) -> None:
+        self.observers[observer.observer_id] = observer
+
+    def remove_observer(self, observer: Observer) -> None:
+        if observer.observer_id in self.observers:
+            self.observers.pop(observer.observer_id)
+
+    def notify_observers(self) -> None:
+        self._notify(self.observers.values(), "update", temperature=self.temperature, humidity=self.humidity,
+                     pressure=self.pressure)
+
+    def _skip_to(self, sequence: int) -> None:
+        self.overruns += sequence - self.last_sequence
+        self.last_sequence = sequence
+
+    def poll(self) -> int:
+        """Delivers the records published since the last poll, and returns how many were delivered.
+        The records which were overwritten before they could be read are counted in `overruns`."""
+        buffer = self.memory.buf
+        _, published = _HEADER.unpack_from(buffer, 0)
+        delivered = 0
+        while self.last_sequence < published:
+            if published - self.last_sequence > self.capacity:
+                self._skip_to(sequence=published - self.capacity)
+            sequence = self.last_sequence + 1
+            offset = _slot_offset(capacity=self.capacity, sequence=sequence)
+            recorded, temperature, humidity, pressure = _RECORD.unpack_from(buffer, offset)
+            # the record is only valid if its slot held it both before and after it was read
+            if recorded != sequence or _SEQUENCE.unpack_from(buffer, offset)[0] != sequence:
+                _, published = _HEADER.unpack_from(buffer, 0)
+                self._skip_to(sequence=max(published - self.capacity, sequence))
+                continue
+
+            self.last_sequence = sequence
+            self.temperature, self.humidity, self.pressure = temperature, humidity, pressure
+            self.notify_observers()
+            delivered += 1
+        return delivered
+
+    def listen(self, until_sequence: int, interval: float = 0.001) -> None:
+        """Polls every `interval` seconds, until the record `until_sequence` has been delivered (or skipped)."""
+        while self.last_sequence < until_sequence:
+            if self.poll() == 0:
+                sleep(interval)
+
+    def close(self) -> None:
+        self.memory.close()
+
+
+class RecordingDisplay(Observer):
+
+    def __init__(self, subject: Subject):
+        super().__init__()
+        self.temperatures: list = []
+
+        subject.register_observer(self)
+
+    def update(self, temperature: float, humidity: float, pressure: float) -> None:
+        self.temperatures.append(temperature)
+
+
+def _consume(name: str, until_sequence: int, results) -> None:
+    subscriber = SharedMemorySubscriber(name=name)
+    display = RecordingDisplay(subject=subscriber)
+    results.put("ready")
+    subscriber.listen(until_sequence=until_sequence)
+    results.put((display.temperatures, subscriber.overruns))
+    subscriber.close()
+
+
+if __name__ == '__main__':
+    import contextlib
+    import io
+    import multiprocessing
+
+    weather_data = WeatherData()
+    publisher = SharedMemoryPublisher(weather_data=weather_data, capacity=1024)
+
+    # a subscriber in another process receives every measurement published after it attached
+    results = multiprocessing.Queue()
+    consumer = multiprocessing.Process(target=_consume, args=(publisher.name, 100, results))
+    consumer.start()
+    assert results.get() == "ready"
+    with contextlib.redirect_stdout(io.StringIO()):
+        for temperature in range(100):
+            weather_data.set_measurements(temperature=float(temperature), humidity=85.3, pressure=1.1)
+    temperatures, overruns = results.get()
+    consumer.join()
+    assert temperatures == [float(temperature) for temperature in range(100)] and overruns == 0
+
+    # a subscriber which falls more than `capacity` records behind detects it, and skips to the oldest record left
+    slow_subscriber = SharedMemorySubscriber(name=publisher.name)
+    slow_display = RecordingDisplay(subject=slow_subscriber)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for temperature in range(1500):
+            weather_data.set_measurements(temperature=float(temperature), humidity=85.3, pressure=1.1)
+    assert slow_subscriber.poll() == 1024
+    assert slow_subscriber.overruns == 476
+    assert slow_display.temperatures[0] == 476.0
+
+    slow_subscriber.close()
+    publisher.close()
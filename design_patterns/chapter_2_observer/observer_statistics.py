@@ -0,0 +1,254 @@
+# Statistics and forecast displays for the WeatherData subject in 'observer.py' (as in the Head First book).
+# The displays keep windowed statistics over the last N measurements (and, optionally, the last T seconds).
+# The measurements are stored in preallocated ring buffers, so that memory stays flat however long the displays run.
+# Each update is O(1) for the mean, variance, min and max. For the percentiles, the window is also kept in sorted order,
+# in buckets of at most 2 * SortedValues.LOAD doubles: a value is placed by bisection (O(log N)), and only the doubles
+# of its bucket have to be moved, however large the window.
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from time import monotonic
+from typing import Callable, Deque, List, Optional, Tuple
+
+from observer import Display, Observer, Subject
+
+
+class SortedValues:
+    """A multiset of floats in sorted order, stored as a list of sorted buckets of native doubles (no float objects).
+    Adding or removing a value finds its bucket by bisection over the largest value of each bucket, and then its
+    position in the bucket by bisection, so that only the doubles of that bucket are moved. Buckets are split once
+    they hold 2 * LOAD values. Finding the value of a given rank walks the bucket sizes, i.e. O(N / LOAD)."""
+    LOAD: int = 512
+
+    def __init__(self):
+        self._buckets: List[array] = []
+        self._maxima: List[float] = []
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, value: float) -> None:
+        self._count += 1
+        if not self._buckets:
+            self._buckets.append(array("d", [value]))
+            self._maxima.append(self._buckets[0][0])
+            return
+        index = min(bisect_left(self._maxima, value), len(self._buckets) - 1)
+        bucket = self._buckets[index]
+        bucket.insert(bisect_right(bucket, value), value)
+        self._maxima[index] = bucket[-1]
+        if len(bucket) >= 2 * self.LOAD:
+            self._buckets.insert(index + 1, bucket[self.LOAD:])
+            del bucket[self.LOAD:]
+            self._maxima.insert(index, bucket[-1])
+
+    def remove(self, value: float) -> None:
+        index = bisect_left(self._maxima, value)
+        bucket = self._buckets[index] if index < len(self._buckets) else None
+        position = bisect_left(bucket, value) if bucket is not None else 0
+        if bucket is None or position == len(bucket) or bucket[position] != value:
+            raise ValueError(f"{value} is not in the values.")
+        del bucket[position]
+        self._count -= 1
+        if len(bucket) == 0:
+            del self._buckets[index]
+            del self._maxima[index]
+        else:
+            self._maxima[index] = bucket[-1]
+
+    def __getitem__(self, rank: int) -> float:
+        if not 0 <= rank < self._count:
+            raise IndexError("The rank is out of range.")
+        for bucket in self._buckets:
+            if rank < len(bucket):
+                return bucket[rank]
+            rank -= len(bucket)
+
+
+class RollingWindow:
+    """The last `capacity` values pushed, restricted to those pushed during the last `duration` seconds if given."""
+
+    def __init__(self, capacity: int, duration: Optional[float] = None, clock: Callable[[], float] = monotonic):
+        if capacity < 1:
+            raise ValueError("The window must be able to hold at least one value.")
+        self.capacity = capacity
+        self.duration = duration
+        self.clock = clock
+
+        self._values = array("d", bytes(capacity * array("d").itemsize))
+        self._timestamps = array("d", bytes(capacity * array("d").itemsize))
+        self._start = 0
+        self._count = 0
+        self._pushed = 0
+        # Welford's running mean and sum of squared deviations, updated as values enter and leave the window.
+        self._mean = 0.0
+        self._squares = 0.0
+        # the candidates for the minimum and maximum, as (push number, value), in increasing and decreasing order.
+        self._minima: Deque[Tuple[int, float]] = deque()
+        self._maxima: Deque[Tuple[int, float]] = deque()
+        # the values of the window in sorted order, for the percentiles.
+        self._sorted = SortedValues()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _evict(self) -> None:
+        value = self._values[self._start]
+        evicted = self._pushed - self._count
+        self._start = (self._start + 1) % self.capacity
+        self._count -= 1
+
+        if self._count == 0:
+            self._mean = self._squares = 0.0
+        else:
+            deviation = value - self._mean
+            self._mean -= deviation / self._count
+            self._squares = max(self._squares - deviation * (value - self._mean), 0.0)
+        if self._minima[0][0] == evicted:
+            self._minima.popleft()
+        if self._maxima[0][0] == evicted:
+            self._maxima.popleft()
+        self._sorted.remove(value)
+
+    def _expire(self, now: float) -> None:
+        if self.duration is not None:
+            while self._count > 0 and self._timestamps[self._start] <= now - self.duration:
+                self._evict()
+
+    def push(self, value: float) -> None:
+        now = self.clock()
+        self._expire(now=now)
+        if self._count == self.capacity:
+            self._evict()
+
+        end = (self._start + self._count) % self.capacity
+        self._values[end] = value
+        self._timestamps[end] = now
+        self._count += 1
+
+        deviation = value - self._mean
+        self._mean += deviation / self._count
+        self._squares += deviation * (value - self._mean)
+        while self._minima and self._minima[-1][1] >= value:
+            self._minima.pop()
+        self._minima.append((self._pushed, value))
+        while self._maxima and self._maxima[-1][1] <= value:
+            self._maxima.pop()
+        self._maxima.append((self._pushed, value))
+        self._sorted.add(value)
+        self._pushed += 1
+
+    def _check_not_empty(self) -> None:
+        self._expire(now=self.clock())
+        if self._count == 0:
+            raise ValueError("The window is empty.")
+
+    def mean(self) -> float:
+        self._check_not_empty()
+        return self._mean
+
+    def variance(self) -> float:
+        """The population variance of the values in the window."""
+        self._check_not_empty()
+        return self._squares / self._count
+
+    def minimum(self) -> float:
+        self._check_not_empty()
+        return self._minima[0][1]
+
+    def maximum(self) -> float:
+        self._check_not_empty()
+        return self._maxima[0][1]
+
+    def percentile(self, percent: float) -> float:
+        """The nearest-rank percentile, e.g. `percentile(50)` is the median of the values in the window."""
+        if not 0 <= percent <= 100:
+            raise ValueError("Percentiles must lie between 0 and 100.")
+        self._check_not_empty()
+        rank = max(int(-(-percent * self._count // 100)), 1)
+        return self._sorted[rank - 1]
+
+
+class StatisticsDisplay(Observer, Display):
+
+    def __init__(self, weather_data: Subject, window_size: int = 1024, window_seconds: Optional[float] = None,
+                 clock: Callable[[], float] = monotonic):
+        super().__init__()
+        self.weather_data = weather_data
+        self.temperatures = RollingWindow(capacity=window_size, duration=window_seconds, clock=clock)
+        self.humidities = RollingWindow(capacity=window_size, duration=window_seconds, clock=clock)
+        self.pressures = RollingWindow(capacity=window_size, duration=window_seconds, clock=clock)
+
+        weather_data.register_observer(self)
+
+    def update(self, temperature: float, humidity: float, pressure: float) -> None:
+        self.temperatures.push(temperature)
+        self.humidities.push(humidity)
+        self.pressures.push(pressure)
+        self.display()
+
+    def update_batch(self, temperatures: memoryview, humidities: memoryview, pressures: memoryview) -> None:
+        for window, values in ((self.temperatures, temperatures), (self.humidities, humidities),
+                               (self.pressures, pressures)):
+            for value in values:
+                window.push(value)
+        self.display()
+
+    def display(self) -> None:
+        print(f"Avg/Max/Min temperature = {self.temperatures.mean():.1f}/{self.temperatures.maximum():.1f}/"
+              f"{self.temperatures.minimum():.1f}, median humidity = {self.humidities.percentile(50):.1f}")
+
+
+class ForecastDisplay(Observer, Display):
+    """Compares the current pressure with its average over the window: rising pressure means better weather."""
+
+    def __init__(self, weather_data: Subject, window_size: int = 64, window_seconds: Optional[float] = None,
+                 clock: Callable[[], float] = monotonic):
+        super().__init__()
+        self.weather_data = weather_data
+        self.pressures = RollingWindow(capacity=window_size, duration=window_seconds, clock=clock)
+        self.forecast: str = "More of the same"
+
+        weather_data.register_observer(self)
+
+    def update(self, temperature: float, humidity: float, pressure: float) -> None:
+        average = self.pressures.mean() if len(self.pressures) > 0 else pressure
+        if pressure > average:
+            self.forecast = "Improving weather on the way!"
+        elif pressure < average:
+            self.forecast = "Watch out for cooler, rainy weather"
+        else:
+            self.forecast = "More of the same"
+        self.pressures.push(pressure)
+        self.display()
+
+    def display(self) -> None:
+        print(f"Forecast: {self.forecast}")
+
+
+if __name__ == '__main__':
+    from observer import WeatherData
+
+    weather_data = WeatherData()
+    statistics_display = StatisticsDisplay(weather_data=weather_data, window_size=3)
+    forecast_display = ForecastDisplay(weather_data=weather_data, window_size=3)
+
+    for temperature, humidity, pressure in [(80, 65, 30.4), (82, 70, 29.2), (78, 90, 29.2), (84, 75, 29.8)]:
+        weather_data.set_measurements(temperature=temperature, humidity=humidity, pressure=pressure)
+
+    # only the last three measurements are kept
+    assert statistics_display.temperatures.mean() == 81.33333333333333
+    assert (statistics_display.temperatures.minimum(), statistics_display.temperatures.maximum()) == (78, 84)
+    assert statistics_display.humidities.percentile(50) == 75
+    assert abs(statistics_display.temperatures.variance() - 56 / 9) < 1e-9
+    assert forecast_display.forecast == "Improving weather on the way!"
+
+    # windows can also be limited in time, here to the values pushed during the last 10 seconds
+    now = [0.0]
+    window = RollingWindow(capacity=100, duration=10, clock=lambda: now[0])
+    for value in range(20):
+        now[0] = float(value)
+        window.push(value)
+    assert (window.minimum(), window.maximum(), len(window)) == (10, 19, 10)
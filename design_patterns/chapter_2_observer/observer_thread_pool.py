@@ -0,0 +1,107 @@
+# A version of the weather subject in 'observer.py' which delivers the updates through a thread pool.
+# This is useful when the observers do blocking I/O (e.g., writing to disk): different observers are updated in
+# parallel, while the updates to any single observer are still delivered one at a time, in the order they were set.
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition, Lock
+from time import perf_counter_ns, sleep
+from typing import Deque, Dict, Optional, Tuple
+
+from observer import Observer, WeatherData
+
+
+class ThreadPoolWeatherData(WeatherData):
+    """Instead of calling `observer.update` inline, `notify_observers` appends the measurements to a backlog
+    per observer. At most one task per observer is submitted to the pool at any time, which drains that backlog in
+    order: this is what keeps the updates to a single observer ordered, without holding a pool thread per observer."""
+
+    def __init__(self, max_workers: Optional[int] = None, executor: Optional[ThreadPoolExecutor] = None):
+        super().__init__()
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers=max_workers)
+        self._backlogs: Dict[int, Deque[Tuple[float, float, float]]] = {}
+        self._scheduled: set = set()
+        self._lock = Lock()
+        self._idle = Condition(self._lock)
+
+    def _drain(self, observer: Observer) -> None:
+        backlog = self._backlogs[observer.observer_id]
+        while True:
+            with self._lock:
+                if not backlog:
+                    # the backlog only exists while it is being drained, so none is left behind for observers
+                    # which are removed or garbage collected.
+                    self._scheduled.discard(observer.observer_id)
+                    self._backlogs.pop(observer.observer_id)
+                    if not self._scheduled:
+                        self._idle.notify_all()
+                    return
+                temperature, humidity, pressure = backlog.popleft()
+            try:
+                stats = self.instrumentation
+                start = perf_counter_ns()
+                observer.update(temperature=temperature, humidity=humidity, pressure=pressure)
+                if stats is not None:
+                    stats.record_update(observer=observer, latency=perf_counter_ns() - start)
+            except Exception as exception:
+                # there is no caller to propagate the exception to, since the update runs in the pool.
+                print(f"Observer {observer.observer_id} failed to update: {exception!r}")
+
+    def notify_observers(self) -> None:
+        # when instrumented, the fan-out only measures the handing over of the updates to the pool
+        stats = self.instrumentation
+        fan_out_start = perf_counter_ns()
+        measurements = (self.temperature, self.humidity, self.pressure)
+        with self._lock:
+            for observer in self.observers.values():
+                self._backlogs.setdefault(observer.observer_id, deque()).append(measurements)
+                if observer.observer_id not in self._scheduled:
+                    self._scheduled.add(observer.observer_id)
+                    self.executor.submit(self._drain, observer)
+        if stats is not None:
+            stats.record_fan_out(latency=perf_counter_ns() - fan_out_start, observer_count=len(self.observers))
+
+    def remove_observer(self, observer: Observer) -> None:
+        super().remove_observer(observer)
+        with self._lock:
+            backlog = self._backlogs.get(observer.observer_id)
+            if backlog is not None:
+                # the pending updates are discarded; an update which is already running is allowed to finish.
+                backlog.clear()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every update notified so far has been delivered. Returns False if `timeout` ran out first."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._scheduled, timeout=timeout)
+
+    def shutdown(self) -> None:
+        self.wait()
+        self.executor.shutdown(wait=True)
+
+
+class BlockingDisplay(Observer):
+    """Stands in for an observer doing blocking I/O, such as writing the measurements to disk."""
+
+    def __init__(self, weather_data: WeatherData, delay: float):
+        super().__init__()
+        self.delay = delay
+        self.temperatures: list = []
+
+        weather_data.register_observer(self)
+
+    def update(self, temperature: float, humidity: float, pressure: float) -> None:
+        sleep(self.delay)
+        self.temperatures.append(temperature)
+
+
+if __name__ == '__main__':
+    weather_data = ThreadPoolWeatherData(max_workers=8)
+    displays = [BlockingDisplay(weather_data=weather_data, delay=0.01) for _ in range(8)]
+
+    for temperature in range(10):
+        weather_data.set_measurements(temperature=float(temperature), humidity=85.3, pressure=1.1)
+    weather_data.shutdown()
+
+    # the displays ran in parallel, but each of them received every update in order
+    for display in displays:
+        assert display.temperatures == [float(temperature) for temperature in range(10)]
@@ -0,0 +1,205 @@
+# Streaming sources of measurements for the WeatherStation in 'observer.py'.
+# A source is read through generators, chunk by chunk, so that arbitrarily long recordings never have to fit in memory:
+# each chunk holds the timestamps (in seconds), temperatures, humidities and pressures of consecutive measurements.
+# `replay` paces the chunks according to their timestamps (in real time, scaled, or as fast as possible)
+# and yields the measurement columns in the shape expected by `WeatherData.set_measurements_batch`.
+
+import contextlib
+import csv
+import io
+import mmap
+import os
+import random
+import tempfile
+from array import array
+from time import perf_counter, sleep
+from typing import Iterator, Optional, Tuple
+
+from observer import Observer, WeatherData, WeatherStation
+
+Chunk = Tuple[memoryview, memoryview, memoryview, memoryview]
+
+FIELDS = ("timestamp", "temperature", "humidity", "pressure")
+
+
+class MeasurementSource:
+
+    def chunks(self, chunk_size: int) -> Iterator[Chunk]:
+        """Yields the timestamps, temperatures, humidities and pressures of at most `chunk_size` measurements
+        at a time."""
+        raise NotImplementedError
+
+    def replay(self, chunk_size: int = 1024, speed: Optional[float] = None) -> Iterator[Tuple[memoryview, ...]]:
+        """Yields the temperatures, humidities and pressures of each chunk, no sooner than the time at which
+        the first measurement of the chunk was taken, relative to the first measurement of the source.
+        A `speed` of 1 replays in real time, a `speed` of 10 ten times faster, and None as fast as possible."""
+        if speed is not None and speed <= 0:
+            raise ValueError("The replay speed must be positive.")
+
+        start = perf_counter()
+        first_timestamp = None
+        for timestamps, temperatures, humidities, pressures in self.chunks(chunk_size=chunk_size):
+            if speed is not None:
+                if first_timestamp is None:
+                    first_timestamp = timestamps[0]
+                delay = (timestamps[0] - first_timestamp) / speed - (perf_counter() - start)
+                if delay > 0:
+                    sleep(delay)
+            yield temperatures, humidities, pressures
+
+
+class SyntheticSource(MeasurementSource):
+    """Random measurements, taken every `interval` seconds, within the same ranges as the original WeatherStation."""
+
+    def __init__(self, count: int, interval: float = 1.0, seed: Optional[int] = None):
+        self.count = count
+        self.interval = interval
+        self.seed = seed
+
+    def chunks(self, chunk_size: int) -> Iterator[Chunk]:
+        generator = random.Random(self.seed)
+        for start in range(0, self.count, chunk_size):
+            columns = [array("d") for _ in FIELDS]
+            timestamps, temperatures, humidities, pressures = columns
+            # the measurements are drawn one at a time, so that they do not depend on the chunk size
+            for index in range(start, min(start + chunk_size, self.count)):
+                timestamps.append(index * self.interval)
+                temperatures.append(generator.uniform(10, 20))
+                humidities.append(generator.uniform(50, 100))
+                pressures.append(generator.uniform(1.1, 1.5))
+            yield tuple(memoryview(column) for column in columns)
+
+
+class CSVSource(MeasurementSource):
+    """A CSV file with a header row and the columns timestamp, temperature, humidity and pressure."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def chunks(self, chunk_size: int) -> Iterator[Chunk]:
+        with open(self.path, newline="") as file:
+            reader = csv.reader(file)
+            header = next(reader, None)
+            if header is None or tuple(header) != FIELDS:
+                raise ValueError(f"The columns of {self.path} should be {', '.join(FIELDS)}.")
+
+            columns = [array("d") for _ in FIELDS]
+            for row in reader:
+                for column, value in zip(columns, row):
+                    column.append(float(value))
+                if len(columns[0]) == chunk_size:
+                    yield tuple(memoryview(column) for column in columns)
+                    columns = [array("d") for _ in FIELDS]
+            if len(columns[0]) > 0:
+                yield tuple(memoryview(column) for column in columns)
+
+    @staticmethod
+    def write(path: str, source: MeasurementSource, chunk_size: int = 65536) -> None:
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(FIELDS)
+            for chunk in source.chunks(chunk_size=chunk_size):
+                writer.writerows(zip(*chunk))
+
+
+class BinaryRecordSource(MeasurementSource):
+    """A file of fixed-size records, each made of four native doubles: timestamp, temperature, humidity and pressure.
+    The file is memory-mapped, and each chunk is made of strided views over the mapping: nothing is copied or parsed."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def chunks(self, chunk_size: int) -> Iterator[Chunk]:
+        with open(self.path, "rb") as file:
+            if file.seek(0, io.SEEK_END) == 0:
+                return
+            # the mapping stays valid after the file is closed, and is released once no view refers to it anymore
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        records = memoryview(mapping).cast("d")
+        if len(records) % len(FIELDS) != 0:
+            raise ValueError(f"{self.path} does not hold a whole number of records.")
+        record_count = len(records) // len(FIELDS)
+        for start in range(0, record_count, chunk_size):
+            stop = min(start + chunk_size, record_count)
+            yield tuple(records[start * len(FIELDS) + offset:stop * len(FIELDS):len(FIELDS)]
+                        for offset in range(len(FIELDS)))
+
+    @staticmethod
+    def write(path: str, source: MeasurementSource, chunk_size: int = 65536) -> None:
+        with open(path, "wb") as file:
+            for chunk in source.chunks(chunk_size=chunk_size):
+                records = array("d", bytes(len(chunk[0]) * len(FIELDS) * array("d").itemsize))
+                for offset, column in enumerate(chunk):
+                    records[offset::len(FIELDS)] = array("d", column)
+                file.write(records)
+
+
+class SummingDisplay(Observer):
+    """Reads every measurement it is given, and keeps their count and the sum of each field (as a display of the
+    averages would), unlike the displays which only look at the last measurement of a batch."""
+
+    def __init__(self, weather_data: WeatherData):
+        super().__init__()
+        self.count = 0
+        self.temperature_sum = 0.0
+        self.humidity_sum = 0.0
+        self.pressure_sum = 0.0
+
+        weather_data.register_observer(self)
+
+    def update(self, temperature: float, humidity: float, pressure: float) -> None:
+        self.count += 1
+        self.temperature_sum += temperature
+        self.humidity_sum += humidity
+        self.pressure_sum += pressure
+
+    def update_batch(self, temperatures: memoryview, humidities: memoryview, pressures: memoryview) -> None:
+        self.count += len(temperatures)
+        self.temperature_sum += sum(temperatures)
+        self.humidity_sum += sum(humidities)
+        self.pressure_sum += sum(pressures)
+
+
+def benchmark_pipeline(count: int = 2_000_000, chunk_size: int = 65536) -> None:
+    """Replays `count` synthetic measurements through a WeatherData with a display which reads all of them,
+    as fast as possible, from memory and from a memory-mapped binary record file."""
+    source = SyntheticSource(count=count, seed=0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "measurements.bin")
+        BinaryRecordSource.write(path=path, source=source)
+
+        for name, replayed in (("synthetic", source), ("memory-mapped", BinaryRecordSource(path=path))):
+            weather_data = WeatherData()
+            display = SummingDisplay(weather_data=weather_data)
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = perf_counter()
+                for temperatures, humidities, pressures in replayed.replay(chunk_size=chunk_size):
+                    weather_data.set_measurements_batch(temperatures=temperatures, humidities=humidities,
+                                                        pressures=pressures)
+                elapsed = perf_counter() - start
+            assert display.count == count
+            print(f"{name:>14}: {count / elapsed:14,.0f} measurements/s, "
+                  f"average temperature {display.temperature_sum / count:.2f}")
+
+
+if __name__ == '__main__':
+    recorded = SyntheticSource(count=10, interval=0.01, seed=42)
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, "measurements.csv")
+        binary_path = os.path.join(directory, "measurements.bin")
+        CSVSource.write(path=csv_path, source=recorded)
+        BinaryRecordSource.write(path=binary_path, source=recorded)
+
+        # all three sources replay the same measurements
+        expected = [[list(column) for column in chunk] for chunk in recorded.chunks(chunk_size=4)]
+        for source in (CSVSource(path=csv_path), BinaryRecordSource(path=binary_path)):
+            assert [[list(column) for column in chunk] for chunk in source.chunks(chunk_size=4)] == expected
+
+        # the station is fed in chunks of four measurements, ten times faster than they were recorded
+        weather_station = WeatherStation()
+        weather_station.generate_measurements(chunks=BinaryRecordSource(path=binary_path).replay(chunk_size=4,
+                                                                                                 speed=10))
+        assert weather_station.weather_data.temperature == expected[-1][1][-1]
+
+    benchmark_pipeline()
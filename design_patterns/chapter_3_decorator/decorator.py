@@ -8,79 +8,217 @@
 # When we compose a decorator with a component, we are adding new behavior:
 # this comes in through the composition of decorators with the base components as well as other decorators.
 
-def _size_to_multiplier(size: str) -> float:
-    if size == 'S':
-        return 1.
-    elif size == 'M':
-        return 1.5
-    elif size == 'L':
-        return 2.
-    else:
-        raise ValueError("The selected value is not supported.")
+import json
+import os
+from collections import Counter, OrderedDict
+from threading import Lock
+from typing import Dict, Hashable, List, Optional, Tuple
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prices.json")
+
+
+class PriceCatalog:
+    """The prices of the beverages and condiments (keyed by class name) and the multipliers of the sizes.
+    The file is parsed once into plain dictionaries, so that every lookup is a single dictionary access.
+    A catalog is never modified after it has been loaded: to change the prices, a new catalog is loaded and swapped in
+    (see `set_catalog`), so that an order which is being priced keeps using the catalog it started with."""
+    __slots__ = ("prices", "multipliers", "path", "modified")
+
+    def __init__(self, prices: Dict[str, float], multipliers: Dict[str, float], path: Optional[str] = None,
+                 modified: Optional[int] = None):
+        self.prices = {name: float(price) for name, price in prices.items()}
+        self.multipliers = {size: float(multiplier) for size, multiplier in multipliers.items()}
+        self.path = path
+        self.modified = modified
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_CATALOG_PATH) -> "PriceCatalog":
+        modified = os.stat(path).st_mtime_ns
+        with open(path) as file:
+            content = json.load(file)
+        try:
+            prices = {**content["beverages"], **content["condiments"]}
+            multipliers = content["sizes"]
+        except (KeyError, TypeError):
+            raise ValueError(f"The catalog {path} must have beverages, condiments and sizes.")
+        return cls(prices=prices, multipliers=multipliers, path=path, modified=modified)
+
+    def price(self, name: str) -> float:
+        try:
+            return self.prices[name]
+        except KeyError:
+            raise ValueError(f"{name} is not in the catalog.")
+
+    def size_multiplier(self, size: str) -> float:
+        try:
+            return self.multipliers[size]
+        except KeyError:
+            raise ValueError("The selected value is not supported.")
+
+
+_catalog: PriceCatalog = PriceCatalog.from_file()
+
+
+def get_catalog() -> PriceCatalog:
+    return _catalog
+
+
+def set_catalog(catalog: PriceCatalog) -> None:
+    """Swaps in a new catalog. Rebinding a global is atomic, so concurrent readers either see the old or the new
+    catalog, never a mix of both."""
+    global _catalog
+    _catalog = catalog
+
+
+def reload_catalog(path: Optional[str] = None) -> PriceCatalog:
+    """Loads the catalog from `path` (by default, the file of the current catalog) and swaps it in."""
+    catalog = PriceCatalog.from_file(path=path or _catalog.path or DEFAULT_CATALOG_PATH)
+    set_catalog(catalog)
+    return catalog
+
+
+def reload_catalog_if_modified() -> bool:
+    """Reloads the current catalog if its file has been modified since it was loaded. Returns whether it was."""
+    catalog = _catalog
+    if catalog.path is None or os.stat(catalog.path).st_mtime_ns == catalog.modified:
+        return False
+    reload_catalog(path=catalog.path)
+    return True
+
+
+def _size_to_multiplier(size: str, catalog: Optional[PriceCatalog] = None) -> float:
+    return (catalog or get_catalog()).size_multiplier(size=size)
 
 
 class Beverage:
+    """The size is held by each instance (an order), not by the class: setting the size of one Expresso does not
+    change the price of the others, so beverages can be priced concurrently without any lock.
+    The beverages only hold their size (and the condiments, the beverage they wrap), hence `__slots__`.
+
+    The prices come from the price catalog. `cost` takes the catalog to use as an optional argument,
+    which is used for the base beverage and every condiment wrapping it, so that a whole order is priced with the same
+    catalog even if a new one is swapped in meanwhile."""
+    __slots__ = ("size",)
     description: str = "Unknown Beverage"
-    size: str = "S"
-    multiplier: float = 1.
 
-    @classmethod
-    def get_description(cls) -> str:
-        return cls.description
+    def __init__(self, size: str = "S"):
+        self.set_size(size=size)
+
+    def get_description(self) -> str:
+        return self.description
 
     @classmethod
-    def cost(cls) -> float:
+    def get_price(cls, catalog: Optional[PriceCatalog] = None) -> float:
+        """The price of the beverage (or of the condiment), before the size multiplier is applied."""
+        return (catalog or get_catalog()).price(name=cls.__name__)
+
+    def cost(self, catalog: Optional[PriceCatalog] = None) -> float:
         raise NotImplementedError
 
-    @classmethod
-    def set_size(cls, size: str) -> None:
-        cls.size = size
-        cls.multiplier = _size_to_multiplier(size=size)
+    def set_size(self, size: str) -> None:
+        _size_to_multiplier(size=size)  # rejects the sizes which are not in the catalog
+        self.size = size
 
-    @classmethod
-    def get_size(cls) -> str:
-        return cls.size
+    def get_size(self) -> str:
+        return self.size
 
-    @classmethod
-    def get_multiplier(cls) -> float:
-        return cls.multiplier
+    def get_multiplier(self, catalog: Optional[PriceCatalog] = None) -> float:
+        return _size_to_multiplier(size=self.size, catalog=catalog)
+
+    def freeze(self) -> "FrozenBeverage":
+        return FrozenBeverage(beverage=self)
 
 
 class CondimentDecorator(Beverage):
+    """A condiment has no size of its own: it reads (and sets) the size of the beverage it wraps.
+
+    The cost and the description of a decorated beverage are not computed by recursing through the wrappers
+    (each condiment calling the beverage it wraps), but by walking down the chain of wrappers in a loop.
+    This way, a beverage with thousands of condiments neither hits the recursion limit nor pays for thousands of
+    nested calls, and the description is joined once instead of being rebuilt at every level.
+    A condiment changes how it is priced by overriding `price_step`, which the loop applies from the innermost condiment
+    outwards. A condiment which overrides `cost` instead is priced by its own `cost`, and ends the walk."""
+    __slots__ = ("beverage",)
+    # whether the cost is the same wherever the condiment is in the chain (see `PricingCache.canonical_key`), which
+    # holds for the default `price_step`. A condiment whose `price_step` does more than adding a price sets it to False,
+    # and so does every condiment which overrides `cost` (see `__init_subclass__`).
+    commutative: bool = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # nothing is known of what a `cost` of its own does, so it cannot be moved around the chain
+        if cls.cost is not CondimentDecorator.cost:
+            cls.commutative = False
 
-    @classmethod
-    def get_description(cls) -> str:
-        return cls.description
+    def __init__(self, beverage: Beverage):
+        # the concrete decorator has an instance variable for the component the decorator is wrapping.
+        self.beverage = beverage
+
+    def price_step(self, total: float, multiplier: float, catalog: PriceCatalog) -> float:
+        """The cost of the beverage with this condiment, given the cost `total` of the beverage it wraps and the size
+        multiplier of the order. By default, the price of the condiment (for the size) is added."""
+        return total + self.get_price(catalog=catalog) * multiplier
+
+    def unwrap(self) -> Tuple[Beverage, List["CondimentDecorator"]]:
+        """The base beverage, and the condiments wrapping it, from the innermost to the outermost."""
+        condiments = []
+        beverage = self
+        while isinstance(beverage, CondimentDecorator):
+            condiments.append(beverage)
+            beverage = beverage.beverage
+        condiments.reverse()
+        return beverage, condiments
+
+    def get_description(self) -> str:
+        beverage, condiments = self.unwrap()
+        return ", ".join([beverage.get_description()] + [condiment.description for condiment in condiments])
+
+    def cost(self, catalog: Optional[PriceCatalog] = None) -> float:
+        catalog = catalog or get_catalog()
+        # down to the base beverage, or to an inner condiment which prices itself
+        condiments = [self]
+        beverage = self.beverage
+        while isinstance(beverage, CondimentDecorator) and type(beverage).cost is CondimentDecorator.cost:
+            condiments.append(beverage)
+            beverage = beverage.beverage
+        multiplier = beverage.get_multiplier(catalog=catalog)
+        # the steps are applied from the innermost condiment outwards, as the recursive evaluation would
+        total = beverage.cost(catalog=catalog)
+        for condiment in reversed(condiments):
+            total = condiment.price_step(total=total, multiplier=multiplier, catalog=catalog)
+        return total
+
+    def set_size(self, size: str) -> None:
+        self.unwrap()[0].set_size(size=size)
+
+    def get_size(self) -> str:
+        return self.unwrap()[0].get_size()
+
+    def get_multiplier(self, catalog: Optional[PriceCatalog] = None) -> float:
+        return self.unwrap()[0].get_multiplier(catalog=catalog)
 
 
 class Expresso(Beverage):
+    __slots__ = ()
     description: str = "Expresso"
 
-    @classmethod
-    def cost(cls) -> float:
-        return 1.99 * cls.get_multiplier()
+    def cost(self, catalog: Optional[PriceCatalog] = None) -> float:
+        catalog = catalog or get_catalog()
+        return self.get_price(catalog=catalog) * self.get_multiplier(catalog=catalog)
 
 
 class HouseBlend(Beverage):
+    __slots__ = ()
     description: str = "House Blend Coffee"
 
-    @classmethod
-    def cost(cls) -> float:
-        return 0.89 * cls.get_multiplier()
+    def cost(self, catalog: Optional[PriceCatalog] = None) -> float:
+        catalog = catalog or get_catalog()
+        return self.get_price(catalog=catalog) * self.get_multiplier(catalog=catalog)
 
 
 class Mocha(CondimentDecorator):
-
-    def __init__(self, beverage: Beverage):
-        # the concrete decorator has an instance variable for the component the decorator is wrapping.
-        self.beverage = beverage
-
-    def get_description(self):
-        return self.beverage.get_description() + ', Mocha'
-
-    def cost(self):
-        base_price = 0.20
-        return self.beverage.cost() + base_price * self.beverage.get_multiplier()
+    __slots__ = ()
+    description: str = "Mocha"
 
     @staticmethod
     def get_mocha() -> str:
@@ -88,33 +226,150 @@ class Mocha(CondimentDecorator):
 
 
 class Soy(CondimentDecorator):
+    __slots__ = ()
+    description: str = "Soy"
 
-    def __init__(self, beverage: Beverage):
-        self.beverage = beverage
 
-    def get_description(self):
-        return self.beverage.get_description() + ', Soy'
+class Whip(CondimentDecorator):
+    __slots__ = ()
+    description: str = "Whip"
 
-    def cost(self):
-        base_price = 0.15
-        return self.beverage.cost() + base_price * self.beverage.get_multiplier()
+    @staticmethod
+    def get_whip() -> str:
+        return "Whip it baby, ooh, whip it right!"
 
 
-class Whip(CondimentDecorator):
+class FrozenBeverage(Beverage):
+    """A decorated beverage flattened into a pricing plan: the base beverage, the multiset of its condiments and
+    its size. Unlike the decorated beverage, whose `cost` and `get_description` go through every wrapper (and rebuild
+    the description at every level), the plan computes them once, and keeps them until its size or the catalog changes.
+    Since the price of a commutative condiment does not depend on where it is in the chain, the condiments up to the
+    first one which is not commutative are kept as a multiset. The ones from there on are kept in order, in `steps`,
+    and priced with their `price_step`. Freezing a chain around a frozen beverage extends its plan.
+    A condiment which overrides `cost` prices the beverage it wraps as it pleases, which no plan can hold: the chains
+    which contain one cannot be frozen."""
+    __slots__ = ("base", "condiments", "steps", "_description", "_cost", "_catalog")
 
     def __init__(self, beverage: Beverage):
-        self.beverage = beverage
-
-    def get_description(self):
-        return self.beverage.get_description() + ', Whip'
-
-    def cost(self):
-        base_price = 0.10
-        return self.beverage.cost() + base_price * self.beverage.get_multiplier()
+        condiments: List[CondimentDecorator] = []
+        if isinstance(beverage, CondimentDecorator):
+            beverage, condiments = beverage.unwrap()
+        for condiment in condiments:
+            if type(condiment).cost is not CondimentDecorator.cost:
+                raise ValueError(f"{type(condiment).__name__} overrides cost, so the beverage cannot be frozen "
+                                 f"(override price_step instead).")
+        boundary = next((position for position, condiment in enumerate(condiments) if not condiment.commutative),
+                        len(condiments))
+
+        if isinstance(beverage, FrozenBeverage):
+            # the condiments of the chain come after the ones of the plan, hence after its steps if it has some
+            if beverage.steps:
+                boundary = 0
+            self.base: type = beverage.base
+            self.condiments: Dict[type, int] = Counter(beverage.condiments)
+            self.steps: Tuple[CondimentDecorator, ...] = beverage.steps
+        else:
+            self.base = type(beverage)
+            self.condiments = Counter()
+            self.steps = ()
+        self.condiments.update(type(condiment) for condiment in condiments[:boundary])
+        self.steps += tuple(condiments[boundary:])
+        self._description: str = ", ".join([beverage.get_description()] +
+                                           [condiment.description for condiment in condiments])
+        super().__init__(size=beverage.get_size())
+
+    def get_description(self) -> str:
+        return self._description
+
+    def cost(self, catalog: Optional[PriceCatalog] = None) -> float:
+        catalog = catalog or get_catalog()
+        if self._cost is None or self._catalog is not catalog:
+            condiments_price = sum(condiment.get_price(catalog=catalog) * count
+                                   for condiment, count in self.condiments.items())
+            base_price = self.base.get_price(catalog=catalog)
+            multiplier = self.get_multiplier(catalog=catalog)
+            cost = (base_price + condiments_price) * multiplier
+            for condiment in self.steps:
+                cost = condiment.price_step(total=cost, multiplier=multiplier, catalog=catalog)
+            self._cost = cost
+            self._catalog = catalog
+        return self._cost
+
+    def set_size(self, size: str) -> None:
+        super().set_size(size=size)
+        self._cost = None
+
+
+class PricingCache:
+    """A bounded cache of the cost of beverages, keyed by their canonical form: the base beverage, the size and the
+    multiset of the condiments. `Whip(Mocha(Expresso()))` and `Mocha(Whip(Expresso()))` therefore share an entry.
+    A chain which contains a condiment that is not commutative keeps the order of its condiments in its key instead.
+    A frozen beverage, alone or wrapped in condiments, is keyed by its plan: its base and condiments.
+
+    The least recently used entry is evicted once `maxsize` entries are cached. The costs only hold for the catalog
+    they were computed with: the cache empties itself when it is used with another catalog, and can be emptied
+    explicitly with `invalidate`."""
+
+    def __init__(self, maxsize: int = 1024):
+        if maxsize < 1:
+            raise ValueError("The cache must be able to hold at least one entry.")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._catalog: Optional[PriceCatalog] = None
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
 
     @staticmethod
-    def get_whip() -> str:
-        return "Whip it baby, ooh, whip it right!"
+    def canonical_key(beverage: Beverage) -> Hashable:
+        condiments = []
+        commutative = True
+        while isinstance(beverage, CondimentDecorator):
+            condiments.append(beverage.__class__.__name__)
+            commutative = commutative and beverage.commutative
+            beverage = beverage.beverage
+        if commutative:
+            condiments.sort()
+        else:
+            condiments.reverse()
+        if isinstance(beverage, FrozenBeverage):
+            # the condiments of the plan (its multiset, then its steps in order), then the ones wrapping it
+            planned = [condiment.__name__ for condiment in beverage.condiments.elements()]
+            steps = [type(condiment).__name__ for condiment in beverage.steps]
+            if commutative and not steps:
+                return beverage.base, beverage.size, tuple(sorted(planned + condiments))
+            return beverage.base, beverage.size, (*sorted(planned), *steps, *condiments)
+        return beverage.__class__, beverage.size, tuple(condiments)
+
+    def cost(self, beverage: Beverage, catalog: Optional[PriceCatalog] = None) -> float:
+        catalog = catalog or get_catalog()
+        key = self.canonical_key(beverage=beverage)
+        with self._lock:
+            if catalog is not self._catalog:
+                self._entries.clear()
+                self._catalog = catalog
+            else:
+                cost = self._entries.get(key)
+                if cost is not None:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return cost
+            self.misses += 1
+            # pricing a beverage is short, and the catalog cannot change under the lock
+            cost = beverage.cost(catalog=catalog)
+            self._entries[key] = cost
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return cost
+
+    def invalidate(self) -> None:
+        """Empties the cache, e.g. after the prices of the current catalog were changed in place."""
+        with self._lock:
+            self._entries.clear()
+            self._catalog = None
 
 
 if __name__ == '__main__':
@@ -132,3 +387,97 @@ if __name__ == '__main__':
     medium_expresso.set_size(size="M")
     assert "M" == medium_expresso.get_size()
     assert 1.5 == medium_expresso.get_multiplier()
+    # the size belongs to the order: the other Expressos are not affected
+    assert "S" == Expresso().get_size()
+    # and condiments are priced with the size of the beverage they wrap
+    assert abs(Mocha(medium_expresso).cost() - 1.5 * (1.99 + 0.20)) < 1e-9
+    assert "L" == Whip(Expresso(size="L")).get_size()
+
+    # a frozen beverage prices and describes itself without going through the chain of decorators
+    frozen_drink = Whip(Soy(Mocha(HouseBlend()))).freeze()
+    assert "House Blend Coffee, Mocha, Soy, Whip" == frozen_drink.get_description()
+    assert abs(frozen_drink.cost() - Whip(Soy(Mocha(HouseBlend()))).cost()) < 1e-9
+    frozen_drink.set_size(size="L")
+    assert abs(frozen_drink.cost() - 2 * (0.89 + 0.20 + 0.15 + 0.10)) < 1e-9
+
+    # the prices live in a catalog file, which can be swapped for another one while orders are being priced
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        promotion_path = os.path.join(directory, "promotion.json")
+        with open(promotion_path, "w") as promotion_file:
+            json.dump({"beverages": {"Expresso": 1.49, "HouseBlend": 0.89},
+                       "condiments": {"Mocha": 0.0, "Soy": 0.15, "Whip": 0.10},
+                       "sizes": {"S": 1.0, "M": 1.5, "L": 2.0, "XL": 2.5}}, promotion_file)
+        regular_catalog = get_catalog()
+        reload_catalog(path=promotion_path)
+        assert abs(Mocha(Expresso(size="XL")).cost() - 2.5 * 1.49) < 1e-9
+        # the frozen beverage notices that the catalog changed
+        assert abs(frozen_drink.cost() - 2 * (0.89 + 0.15 + 0.10)) < 1e-9
+        # an order can still be priced with a given catalog
+        assert abs(Mocha(Expresso()).cost(catalog=regular_catalog) - (1.99 + 0.20)) < 1e-9
+        set_catalog(regular_catalog)
+
+    # a frozen beverage can be frozen again, alone or with more condiments
+    assert abs(Expresso().freeze().freeze().cost() - 1.99) < 1e-9
+    refrozen_drink = Mocha(Soy(HouseBlend()).freeze()).freeze()
+    assert refrozen_drink.base is HouseBlend and refrozen_drink.condiments == {Soy: 1, Mocha: 1}
+    assert "House Blend Coffee, Soy, Mocha" == refrozen_drink.get_description()
+    assert abs(refrozen_drink.cost() - (0.89 + 0.15 + 0.20)) < 1e-9
+
+    # a condiment can price itself differently, and its place in the chain then matters
+    class HalfPrice(CondimentDecorator):
+        __slots__ = ()
+        description: str = "Half Price"
+        commutative: bool = False
+
+        def price_step(self, total: float, multiplier: float, catalog: PriceCatalog) -> float:
+            return total / 2
+
+    assert abs(Whip(HalfPrice(Expresso())).cost() - (1.99 / 2 + 0.10)) < 1e-9
+    assert abs(HalfPrice(Whip(Expresso())).cost() - (1.99 + 0.10) / 2) < 1e-9
+    assert abs(Whip(HalfPrice(Mocha(Expresso(size="M")))).freeze().cost() - 1.5 * ((1.99 + 0.20) / 2 + 0.10)) < 1e-9
+    assert abs(Whip(HalfPrice(Mocha(Expresso())).freeze()).freeze().cost() - ((1.99 + 0.20) / 2 + 0.10)) < 1e-9
+    assert PricingCache().cost(Whip(HalfPrice(Expresso()))) != PricingCache().cost(HalfPrice(Whip(Expresso())))
+
+    # and so does the place of a condiment which overrides `cost`
+    class Promo(CondimentDecorator):
+        __slots__ = ()
+        description: str = "Promo"
+
+        def cost(self, catalog: Optional[PriceCatalog] = None) -> float:
+            return 0.0
+
+    assert not Promo.commutative
+    promo_cache = PricingCache()
+    assert abs(promo_cache.cost(Whip(Promo(Expresso()))) - 0.10) < 1e-9
+    assert promo_cache.cost(Promo(Whip(Expresso()))) == 0.0 and promo_cache.misses == 2
+    # which a frozen beverage cannot hold
+    try:
+        Whip(Promo(Expresso())).freeze()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("A chain with a condiment which overrides cost should not be frozen.")
+
+    # promotional beverages can be thousands of condiments deep: they are priced without any recursion
+    promotional_drink = Expresso()
+    for _ in range(10_000):
+        promotional_drink = Whip(promotional_drink)
+    assert abs(promotional_drink.cost() - (1.99 + 10_000 * 0.10)) < 1e-6
+    assert promotional_drink.get_description().count("Whip") == 10_000
+
+    # the same few drinks are ordered over and over: their costs are cached, whatever the order of the condiments
+    pricing_cache = PricingCache(maxsize=2)
+    assert pricing_cache.cost(Whip(Mocha(Expresso()))) == pricing_cache.cost(Mocha(Whip(Expresso())))
+    assert (pricing_cache.hits, pricing_cache.misses) == (1, 1)
+    assert pricing_cache.cost(Whip(Mocha(Expresso()))) != pricing_cache.cost(Whip(Mocha(Expresso(size="L"))))
+    pricing_cache.cost(Soy(HouseBlend()))  # evicts the least recently used entry, the small Expresso
+    assert len(pricing_cache) == 2 and pricing_cache.cost(Mocha(Whip(Expresso()))) and pricing_cache.misses == 4
+    # a chain around a frozen beverage is keyed by what the plan holds, not by the FrozenBeverage class
+    assert abs(pricing_cache.cost(Mocha(Whip(Expresso()).freeze())) - (1.99 + 0.10 + 0.20)) < 1e-9
+    assert abs(pricing_cache.cost(Mocha(Soy(HouseBlend()).freeze())) - (0.89 + 0.15 + 0.20)) < 1e-9
+    assert pricing_cache.canonical_key(Mocha(Whip(Expresso()).freeze())) == pricing_cache.canonical_key(
+        Whip(Mocha(Expresso())))
+    set_catalog(PriceCatalog(prices={**regular_catalog.prices, "Whip": 0.0}, multipliers=regular_catalog.multipliers))
+    assert abs(pricing_cache.cost(Whip(Mocha(Expresso()))) - (1.99 + 0.20)) < 1e-9
+    set_catalog(regular_catalog)
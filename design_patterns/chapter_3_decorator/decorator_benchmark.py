@@ -0,0 +1,133 @@
+# Benchmarks for the beverages in 'decorator.py'.
+
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import perf_counter
+
+import numpy as np
+
+from decorator import Beverage, CondimentDecorator, Expresso, Mocha, PriceCatalog, PricingCache, Whip, get_catalog
+from decorator_bulk_pricing import BEVERAGES, CONDIMENTS, get_sizes, price_orders, random_order
+
+
+def benchmark_contention(order_count: int = 200_000, thread_counts=(1, 4, 16, 32), chunk_size: int = 1_000) -> None:
+    """Prices `order_count` orders (Whip, Mocha, Expresso of a random size) from a thread pool,
+    with the size held by a shared beverage behind a global lock (as it was when the size belonged to the class),
+    and with the size held by each order, without any lock."""
+    sizes = [random.choice(get_sizes()) for _ in range(order_count)]
+    chunks = [sizes[start:start + chunk_size] for start in range(0, order_count, chunk_size)]
+
+    shared_expresso = Expresso()
+    lock = Lock()
+
+    def price_with_global_lock(chunk) -> float:
+        total = 0.
+        for size in chunk:
+            with lock:
+                shared_expresso.set_size(size=size)
+                total += Whip(Mocha(shared_expresso)).cost()
+        return total
+
+    def price_per_order(chunk) -> float:
+        total = 0.
+        for size in chunk:
+            total += Whip(Mocha(Expresso(size=size))).cost()
+        return total
+
+    print(f"Pricing {order_count} orders:")
+    for thread_count in thread_counts:
+        results = {}
+        for name, price in (("global lock", price_with_global_lock), ("per order", price_per_order)):
+            with ThreadPoolExecutor(max_workers=thread_count) as executor:
+                start = perf_counter()
+                total = sum(executor.map(price, chunks))
+                results[name] = (order_count / (perf_counter() - start), total)
+        assert abs(results["global lock"][1] - results["per order"][1]) < 1e-6 * order_count
+        print(f"{thread_count:>4} threads: global lock {results['global lock'][0]:12,.0f} orders/s, "
+              f"per order {results['per order'][0]:12,.0f} orders/s")
+
+
+def benchmark_bulk_pricing(order_count: int = 1_000_000, seed: int = 0) -> None:
+    """Compares repricing `order_count` random orders through the decorators and through the bulk path."""
+    generator = random.Random(seed)
+    numpy_generator = np.random.default_rng(seed)
+    beverage_codes = numpy_generator.integers(0, len(BEVERAGES), size=order_count)
+    size_codes = numpy_generator.integers(0, len(get_sizes()), size=order_count)
+    condiment_counts = numpy_generator.integers(0, 3, size=(order_count, len(CONDIMENTS)))
+
+    sample_count = min(order_count, 100_000)
+    orders = [random_order(generator=generator) for _ in range(sample_count)]
+    start = perf_counter()
+    for order in orders:
+        order.cost()
+    object_rate = sample_count / (perf_counter() - start)
+
+    start = perf_counter()
+    price_orders(beverage_codes=beverage_codes, size_codes=size_codes, condiment_counts=condiment_counts)
+    bulk_rate = order_count / (perf_counter() - start)
+    print(f"Repricing: decorators {object_rate:14,.0f} orders/s (already built), bulk {bulk_rate:14,.0f} orders/s")
+
+
+def _recursive_cost(beverage: Beverage, catalog: PriceCatalog) -> float:
+    """The cost as it used to be evaluated, each condiment adding its price to the cost of the beverage it wraps."""
+    if not isinstance(beverage, CondimentDecorator):
+        return beverage.cost(catalog=catalog)
+    return _recursive_cost(beverage.beverage, catalog) + beverage.get_price(catalog=catalog) * _recursive_multiplier(
+        beverage.beverage, catalog)
+
+
+def _recursive_multiplier(beverage: Beverage, catalog: PriceCatalog) -> float:
+    if not isinstance(beverage, CondimentDecorator):
+        return beverage.get_multiplier(catalog=catalog)
+    return _recursive_multiplier(beverage.beverage, catalog)
+
+
+def benchmark_depth(depths=(10, 100, 10_000), repeat: int = 10) -> None:
+    """Compares the recursive and the iterative evaluation of the cost of an Expresso with `depth` Whips.
+    With Python's default recursion limit, the recursive evaluation of the deepest stacks fails."""
+    catalog = get_catalog()
+    for depth in depths:
+        beverage = Expresso()
+        for _ in range(depth):
+            beverage = Whip(beverage)
+
+        start = perf_counter()
+        for _ in range(repeat):
+            cost = beverage.cost(catalog=catalog)
+        iterative = f"{(perf_counter() - start) / repeat * 1e6:12,.1f} us"
+        try:
+            start = perf_counter()
+            for _ in range(repeat):
+                assert abs(_recursive_cost(beverage, catalog) - cost) < 1e-9 * depth
+            recursive = f"{(perf_counter() - start) / repeat * 1e6:12,.1f} us"
+        except RecursionError:
+            recursive = f"RecursionError (limit {sys.getrecursionlimit()})"
+        print(f"Depth {depth:>6}: iterative {iterative}, recursive {recursive}")
+
+
+def benchmark_pricing_cache(order_count: int = 200_000, menu_size: int = 300, maxsize: int = 1024,
+                            seed: int = 0) -> None:
+    """Prices `order_count` orders drawn from a menu of `menu_size` random drinks, with and without a PricingCache."""
+    generator = random.Random(seed)
+    menu = [random_order(generator=generator) for _ in range(menu_size)]
+    orders = [generator.choice(menu) for _ in range(order_count)]
+    cache = PricingCache(maxsize=maxsize)
+
+    start = perf_counter()
+    uncached = sum(order.cost() for order in orders)
+    uncached_rate = order_count / (perf_counter() - start)
+    start = perf_counter()
+    cached = sum(cache.cost(beverage=order) for order in orders)
+    cached_rate = order_count / (perf_counter() - start)
+    assert abs(cached - uncached) < 1e-6 * order_count
+    print(f"Pricing: uncached {uncached_rate:12,.0f} orders/s, cached {cached_rate:12,.0f} orders/s "
+          f"({cache.hits} hits, {cache.misses} misses)")
+
+
+if __name__ == '__main__':
+    benchmark_contention()
+    benchmark_bulk_pricing()
+    benchmark_depth()
+    benchmark_pricing_cache()
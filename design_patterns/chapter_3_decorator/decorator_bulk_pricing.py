@@ -0,0 +1,162 @@
+# Bulk pricing of beverage orders with NumPy (which, unlike the rest of this repository, needs to be installed).
+# Building a chain of decorators and calling `cost` on each order is too slow to reprice millions of orders.
+# Here, the orders are encoded as arrays instead: the code of the base beverage, the code of the size, and the number
+# of times each condiment was added. The costs then follow from a few vectorized operations, with the same semantics
+# as the decorators: (price of the base beverage + prices of the condiments) * multiplier of the size.
+# The prices come from the same catalog as the decorators, turned into NumPy lookup tables once per catalog.
+# The sizes are those of the catalog (a catalog may add or drop sizes), so a size code only holds for the catalog the
+# order was encoded with.
+
+import random
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from decorator import (Beverage, CondimentDecorator, Expresso, HouseBlend, Mocha, PriceCatalog, Soy, Whip,
+                       get_catalog, set_catalog)
+
+# the codes of the beverages and condiments are their positions in these tuples, and the code of a size is its position
+# in the sizes of the catalog (see `get_sizes`)
+BEVERAGES = (Expresso, HouseBlend)
+CONDIMENTS = (Mocha, Soy, Whip)
+
+
+# the last catalog used, the code of each of its sizes, and its lookup tables (beverage prices, condiment prices,
+# multipliers)
+_tables: Tuple[Optional[PriceCatalog], Dict[str, int], Tuple[np.ndarray, ...]] = (None, {}, ())
+
+
+def _lookup_tables(catalog: PriceCatalog) -> Tuple[Dict[str, int], Tuple[np.ndarray, ...]]:
+    global _tables
+    cached_catalog, size_codes, tables = _tables
+    if cached_catalog is not catalog:
+        size_codes = {size: code for code, size in enumerate(catalog.multipliers)}
+        tables = (np.array([beverage.get_price(catalog=catalog) for beverage in BEVERAGES]),
+                  np.array([condiment.get_price(catalog=catalog) for condiment in CONDIMENTS]),
+                  np.array(list(catalog.multipliers.values()), dtype=np.float64))
+        # the catalog, its sizes and its tables are swapped in together, so that concurrent callers never mix them up
+        _tables = (catalog, size_codes, tables)
+    return size_codes, tables
+
+
+def get_sizes(catalog: Optional[PriceCatalog] = None) -> Tuple[str, ...]:
+    """The sizes of the catalog (by default, the current one), in the order of their codes."""
+    return tuple(_lookup_tables(catalog=catalog or get_catalog())[0])
+
+
+def _check_codes(codes: np.ndarray, count: int, kind: str) -> None:
+    if codes.size > 0 and (codes.min() < 0 or codes.max() >= count):
+        raise ValueError(f"The {kind} codes must lie between 0 and {count - 1}.")
+
+
+def price_orders(beverage_codes, size_codes, condiment_counts, catalog: Optional[PriceCatalog] = None) -> np.ndarray:
+    """Returns the cost of each order. `beverage_codes` and `size_codes` have one entry per order, and
+    `condiment_counts` has one row per order and one column per condiment (in the order of CONDIMENTS).
+    By default, the orders are priced with the current catalog, which must be the one they were encoded with."""
+    beverage_codes = np.asarray(beverage_codes, dtype=np.intp)
+    size_codes = np.asarray(size_codes, dtype=np.intp)
+    condiment_counts = np.asarray(condiment_counts, dtype=np.float64)
+    if beverage_codes.ndim != 1 or beverage_codes.shape != size_codes.shape:
+        raise ValueError("There must be exactly one beverage code and one size code per order.")
+    if condiment_counts.shape != (len(beverage_codes), len(CONDIMENTS)):
+        raise ValueError(f"There must be one row per order and {len(CONDIMENTS)} columns of condiment counts.")
+    sizes, (beverage_prices, condiment_prices, multipliers) = _lookup_tables(catalog=catalog or get_catalog())
+    _check_codes(codes=beverage_codes, count=len(BEVERAGES), kind="beverage")
+    _check_codes(codes=size_codes, count=len(sizes), kind="size")
+
+    return (beverage_prices[beverage_codes] + condiment_counts @ condiment_prices) * multipliers[size_codes]
+
+
+def encode_order(beverage: Beverage, catalog: Optional[PriceCatalog] = None) -> Tuple[int, int, list]:
+    """The beverage code, size code (in the catalog, by default the current one) and condiment counts of a decorated
+    beverage."""
+    size_codes = _lookup_tables(catalog=catalog or get_catalog())[0]
+    counts = [0] * len(CONDIMENTS)
+    while isinstance(beverage, CondimentDecorator):
+        if type(beverage) not in CONDIMENTS:
+            raise ValueError(f"The condiment {type(beverage).__name__} cannot be priced in bulk.")
+        counts[CONDIMENTS.index(type(beverage))] += 1
+        beverage = beverage.beverage
+    if type(beverage) not in BEVERAGES:
+        raise ValueError(f"The beverage {type(beverage).__name__} cannot be priced in bulk.")
+    try:
+        size_code = size_codes[beverage.get_size()]
+    except KeyError:
+        raise ValueError(f"The size {beverage.get_size()} is not in the catalog.")
+    return BEVERAGES.index(type(beverage)), size_code, counts
+
+
+def encode_orders(beverages: Iterable[Beverage],
+                  catalog: Optional[PriceCatalog] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    catalog = catalog or get_catalog()
+    beverage_codes, size_codes, condiment_counts = [], [], []
+    for beverage in beverages:
+        beverage_code, size_code, counts = encode_order(beverage=beverage, catalog=catalog)
+        beverage_codes.append(beverage_code)
+        size_codes.append(size_code)
+        condiment_counts.append(counts)
+    return (np.array(beverage_codes, dtype=np.intp), np.array(size_codes, dtype=np.intp),
+            np.array(condiment_counts, dtype=np.float64).reshape(-1, len(CONDIMENTS)))
+
+
+def random_order(generator: random.Random, max_condiments: int = 6) -> Beverage:
+    beverage = generator.choice(BEVERAGES)(size=generator.choice(get_sizes()))
+    for _ in range(generator.randint(0, max_condiments)):
+        beverage = generator.choice(CONDIMENTS)(beverage)
+    return beverage
+
+
+def check_parity(order_count: int = 10_000, seed: int = 0) -> None:
+    """Checks that the bulk path prices orders exactly like the decorators (up to floating point rounding)."""
+    generator = random.Random(seed)
+
+    # every beverage, in every size, without any condiment
+    plain = [beverage(size=size) for beverage in BEVERAGES for size in get_sizes()]
+    # every condiment, on every beverage, in every size
+    single = [condiment(beverage(size=size)) for condiment in CONDIMENTS for beverage in BEVERAGES
+              for size in get_sizes()]
+    # the same condiment added many times
+    repeated = [Expresso(size=get_sizes()[-1])]
+    for _ in range(50):
+        repeated.append(Whip(repeated[-1]))
+    random_orders = [random_order(generator=generator) for _ in range(order_count)]
+
+    for orders in (plain, single, repeated, random_orders):
+        expected = np.array([order.cost() for order in orders])
+        costs = price_orders(*encode_orders(beverages=orders))
+        assert np.allclose(costs, expected, rtol=1e-12, atol=1e-12), np.abs(costs - expected).max()
+
+    assert price_orders([], [], np.empty((0, len(CONDIMENTS)))).shape == (0,)
+    for invalid in (([2], [0], [[0, 0, 0]]), ([0], [3], [[0, 0, 0]]), ([0], [0], [[0, 0]])):
+        try:
+            price_orders(*invalid)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{invalid} should have been rejected.")
+    for unsupported in (Whip(Expresso()).freeze(), Whip(CondimentDecorator(Expresso()))):
+        try:
+            encode_order(beverage=unsupported)
+        except ValueError as error:
+            assert "FrozenBeverage" in str(error) or "CondimentDecorator" in str(error), error
+        else:
+            raise AssertionError(f"{unsupported.get_description()} should have been rejected.")
+
+
+if __name__ == '__main__':
+    # a medium House Blend with two Mochas and a Whip, and a large Expresso with Soy
+    costs = price_orders(beverage_codes=[1, 0], size_codes=[1, 2], condiment_counts=[[2, 0, 1], [0, 1, 0]])
+    assert np.allclose(costs, [Whip(Mocha(Mocha(HouseBlend(size="M")))).cost(), Soy(Expresso(size="L")).cost()])
+
+    check_parity()
+
+    # a catalog which adds a size and drops another one has its own size codes
+    regular_catalog = get_catalog()
+    set_catalog(PriceCatalog(prices=regular_catalog.prices, multipliers={"S": 1.0, "M": 1.5, "XL": 2.5}))
+    try:
+        assert get_sizes() == ("S", "M", "XL")
+        check_parity(order_count=1_000)
+    finally:
+        set_catalog(regular_catalog)
+    assert get_sizes() == ("S", "M", "L")
+    print("The bulk prices match the decorators.")
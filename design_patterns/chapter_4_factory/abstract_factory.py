@@ -8,27 +8,41 @@
 # The inheritance in this case can be seen at the level of dough, sauce and toppings)
 # and the latter through *object composition*.
 
-class Dough:
+import copy
+from typing import Dict, Iterable, Optional, Tuple
+
+from kitchen_pipeline import KitchenPipeline, PipelineReport
+from pizza_registry import PizzaRegistry
+
+
+class Ingredient:
+    """The ingredients hold no state, so a factory hands out the same instance of an ingredient to every pizza
+    (a flyweight) instead of allocating a new one per pizza. An ingredient which holds state of its own (and can
+    therefore differ from one pizza to the next) opts out by setting `shared` to False."""
+    shared: bool = True
+
+
+class Dough(Ingredient):
     pass
 
 
-class Sauce:
+class Sauce(Ingredient):
     pass
 
 
-class Cheese:
+class Cheese(Ingredient):
     pass
 
 
-class Veggies:
+class Veggies(Ingredient):
     pass
 
 
-class Pepperoni:
+class Pepperoni(Ingredient):
     pass
 
 
-class Clams:
+class Clams(Ingredient):
     pass
 
 
@@ -62,8 +76,27 @@ class Pizza:
     def __str__(self):
         print(f"The yummy pizza is {self.name}!")
 
+    def clone(self) -> "Pizza":
+        """A copy of the pizza, which shares its ingredients with it, except for those which are not shared
+        (see `Ingredient`), which are copied as well."""
+        clone = object.__new__(self.__class__)
+        state = self.__dict__.copy()
+        for attribute, value in state.items():
+            if isinstance(value, Ingredient) and not value.shared:
+                state[attribute] = copy.copy(value)
+        clone.__dict__ = state
+        return clone
+
 
 class PizzaStore:
+    # the ingredient factory of the store, created once (see the concrete stores) instead of once per order
+    ingredient_factory: "PizzaIngredientFactory"
+    # most orders are identical: a pizza of each type is prepared once, and the next orders clone it instead of
+    # preparing a new pizza. The prototypes are kept per (store, pizza type), and only used while the store has the
+    # ingredient factory they were prepared with.
+    cache_prototypes: bool = True
+    _prototypes: Dict[Tuple[type, str], Pizza] = {}
+
     @classmethod
     def order_pizza(cls, pizza_type: str) -> Pizza:
         """
@@ -74,14 +107,52 @@ class PizzaStore:
         :param pizza_type:
         :return:
         """
-        pizza = cls.create_pizza(pizza_type=pizza_type)
+        pizza = cls.prepare_pizza(pizza_type=pizza_type)
 
-        pizza.prepare()
         pizza.bake()
         pizza.cut()
         pizza.box()
         return pizza
 
+    @classmethod
+    def prepare_pizza(cls, pizza_type: str) -> Pizza:
+        """A prepared pizza of type `pizza_type`: a clone of its prototype, which is only prepared for the first order
+        (unless the store does not cache its prototypes)."""
+        if not cls.cache_prototypes:
+            pizza = cls.create_pizza(pizza_type=pizza_type)
+            pizza.prepare()
+            return pizza
+        prototype = PizzaStore._prototypes.get((cls, pizza_type))
+        # the ingredient factory may have been assigned directly, or inherited from a store whose factory was changed
+        if prototype is None or prototype.ingredient_factory is not cls.ingredient_factory:
+            prototype = cls.create_pizza(pizza_type=pizza_type)
+            prototype.prepare()
+            PizzaStore._prototypes[(cls, pizza_type)] = prototype
+        return prototype.clone()
+
+    @classmethod
+    def invalidate_prototypes(cls) -> None:
+        """Drops the prototypes of the store, which must be called whenever what goes into its pizzas changes
+        (other than its ingredient factory, which the prototypes are checked against)."""
+        for key in [key for key in PizzaStore._prototypes if key[0] is cls]:
+            PizzaStore._prototypes.pop(key, None)
+
+    @classmethod
+    def set_ingredient_factory(cls, ingredient_factory: "PizzaIngredientFactory") -> None:
+        cls.ingredient_factory = ingredient_factory
+        cls.invalidate_prototypes()
+
+    @classmethod
+    def order_pizzas(cls, pizza_types: Iterable[str], workers: Optional[Dict[str, int]] = None,
+                     queue_size: int = 16) -> PipelineReport:
+        """Orders many pizzas at once: the steps of `order_pizza` become the stages of a pipeline, each with its own
+        workers (see `KitchenPipeline`). The report holds the pizzas, in order, and the throughput of the kitchen.
+        The pizzas are created rather than cloned from the prototypes: preparing them is the first stage of the
+        pipeline, whose workers and utilization the report is about, and a cloned pizza would be prepared again there.
+        """
+        kitchen = KitchenPipeline(create_pizza=cls.create_pizza, workers=workers, queue_size=queue_size)
+        return kitchen.run(pizza_types=pizza_types)
+
     @classmethod
     def create_pizza(cls, pizza_type: str) -> Pizza:
         raise NotImplementedError
@@ -91,6 +162,22 @@ class PizzaIngredientFactory:
     """This abstract interface defines how to make a family of related products (e.g., the ingredients).
     The disadvantage here is that one would need to add a new method here (and to the corresponding) subclasses
     if a new ingredient (for example, pineapple) was added."""
+    # the shared ingredients handed out by the factory, per ingredient class (each factory has its own)
+    _ingredients: Dict[type, Ingredient] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._ingredients = {}
+
+    @classmethod
+    def get_ingredient(cls, ingredient_class: type) -> Ingredient:
+        """The shared instance of `ingredient_class`, or a new one if the ingredient is not shared."""
+        if not ingredient_class.shared:
+            return ingredient_class()
+        ingredient = cls._ingredients.get(ingredient_class)
+        if ingredient is None:
+            ingredient = cls._ingredients.setdefault(ingredient_class, ingredient_class())
+        return ingredient
 
     @classmethod
     def create_dough(cls):
@@ -142,31 +229,74 @@ class DicedVeggies(Veggies):
     pass
 
 
+class ThickCrustDough(Dough):
+    pass
+
+
+class PlumTomatoSauce(Sauce):
+    pass
+
+
+class MozzarellaCheese(Cheese):
+    pass
+
+
+class FrozenClams(Clams):
+    pass
+
+
 class NYPizzaIngredientFactory(PizzaIngredientFactory):
 
     @classmethod
     def create_dough(cls) -> Dough:
-        return ThinCrustDough()
+        return cls.get_ingredient(ingredient_class=ThinCrustDough)
 
     @classmethod
     def create_sauce(cls) -> Sauce:
-        return MarinaraSauce()
+        return cls.get_ingredient(ingredient_class=MarinaraSauce)
 
     @classmethod
     def create_cheese(cls) -> Cheese:
-        return ReggianoCheese()
+        return cls.get_ingredient(ingredient_class=ReggianoCheese)
 
     @classmethod
     def create_veggies(cls) -> Veggies:
-        return DicedVeggies()
+        return cls.get_ingredient(ingredient_class=DicedVeggies)
 
     @classmethod
     def create_pepperoni(cls) -> Pepperoni:
-        return SlicedPepperoni()
+        return cls.get_ingredient(ingredient_class=SlicedPepperoni)
 
     @classmethod
     def create_clam(cls) -> Clams:
-        return FreshClams()
+        return cls.get_ingredient(ingredient_class=FreshClams)
+
+
+class ChicagoPizzaIngredientFactory(PizzaIngredientFactory):
+
+    @classmethod
+    def create_dough(cls) -> Dough:
+        return cls.get_ingredient(ingredient_class=ThickCrustDough)
+
+    @classmethod
+    def create_sauce(cls) -> Sauce:
+        return cls.get_ingredient(ingredient_class=PlumTomatoSauce)
+
+    @classmethod
+    def create_cheese(cls) -> Cheese:
+        return cls.get_ingredient(ingredient_class=MozzarellaCheese)
+
+    @classmethod
+    def create_veggies(cls) -> Veggies:
+        return cls.get_ingredient(ingredient_class=DicedVeggies)
+
+    @classmethod
+    def create_pepperoni(cls) -> Pepperoni:
+        return cls.get_ingredient(ingredient_class=SlicedPepperoni)
+
+    @classmethod
+    def create_clam(cls) -> Clams:
+        return cls.get_ingredient(ingredient_class=FrozenClams)
 
 
 class CheesePizza(Pizza):
@@ -220,30 +350,88 @@ class VeggiePizza(Pizza):
         self.veggies = self.ingredient_factory.create_veggies()
 
 
+# the pizza types NYPizzaStore can create, with the names they get in New York
+ny_pizzas = PizzaRegistry()
+
+
+@ny_pizzas.register("cheese")
+def create_ny_cheese_pizza(ingredient_factory: PizzaIngredientFactory) -> Pizza:
+    pizza = CheesePizza(ingredient_factory=ingredient_factory)
+    pizza.set_name("NY Style Cheese Pizza")
+    return pizza
+
+
+@ny_pizzas.register("pepperoni")
+def create_ny_pepperoni_pizza(ingredient_factory: PizzaIngredientFactory) -> Pizza:
+    pizza = PepperoniPizza(ingredient_factory=ingredient_factory)
+    pizza.set_name("NY Style Pep Pizza")
+    return pizza
+
+
+@ny_pizzas.register("clam")
+def create_ny_clam_pizza(ingredient_factory: PizzaIngredientFactory) -> Pizza:
+    pizza = ClamPizza(ingredient_factory=ingredient_factory)
+    pizza.set_name("NY Style Clam Pizza")
+    return pizza
+
+
+@ny_pizzas.register("veggie")
+def create_ny_veggie_pizza(ingredient_factory: PizzaIngredientFactory) -> Pizza:
+    pizza = VeggiePizza(ingredient_factory=ingredient_factory)
+    pizza.set_name("NY Style Veggie Pizza")
+    return pizza
+
+
 class NYPizzaStore(PizzaStore):
     """The factory method `create_pizza` is implemented in the concrete subclass of PizzaStore, NYPizzaStore.
     It is this factory method that is responsible for instantiation."""
 
+    ingredient_factory: PizzaIngredientFactory = NYPizzaIngredientFactory()
+
     @classmethod
     def create_pizza(cls, pizza_type: str) -> Pizza:
         # this is where the object composition happens
-        ingredient_factory: PizzaIngredientFactory = NYPizzaIngredientFactory()
-
-        if pizza_type == "cheese":
-            pizza = CheesePizza(ingredient_factory=ingredient_factory)
-            pizza.set_name("NY Style Cheese Pizza")
-        elif pizza_type == "pepperoni":
-            pizza = PepperoniPizza(ingredient_factory=ingredient_factory)
-            pizza.set_name("NY Style Pep Pizza")
-        elif pizza_type == "clam":
-            pizza = ClamPizza(ingredient_factory=ingredient_factory)
-            pizza.set_name("NY Style Clam Pizza")
-        elif pizza_type == "veggie":
-            pizza = VeggiePizza(ingredient_factory=ingredient_factory)
-            pizza.set_name("NY Style Veggie Pizza")
-        else:
-            raise ValueError(f"Pizza type {pizza_type} is not supported.")
-        return pizza
+        return ny_pizzas.create(pizza_type=pizza_type, ingredient_factory=cls.ingredient_factory)
+
+
+# the pizza types ChicagoPizzaStore can create: the same pizzas as in New York, with other names and ingredients
+chicago_pizzas = PizzaRegistry()
+
+
+@chicago_pizzas.register("cheese")
+def create_chicago_cheese_pizza(ingredient_factory: PizzaIngredientFactory) -> Pizza:
+    pizza = CheesePizza(ingredient_factory=ingredient_factory)
+    pizza.set_name("Chicago Style Cheese Pizza")
+    return pizza
+
+
+@chicago_pizzas.register("pepperoni")
+def create_chicago_pepperoni_pizza(ingredient_factory: PizzaIngredientFactory) -> Pizza:
+    pizza = PepperoniPizza(ingredient_factory=ingredient_factory)
+    pizza.set_name("Chicago Style Pepperoni Pizza")
+    return pizza
+
+
+@chicago_pizzas.register("clam")
+def create_chicago_clam_pizza(ingredient_factory: PizzaIngredientFactory) -> Pizza:
+    pizza = ClamPizza(ingredient_factory=ingredient_factory)
+    pizza.set_name("Chicago Style Clam Pizza")
+    return pizza
+
+
+@chicago_pizzas.register("veggie")
+def create_chicago_veggie_pizza(ingredient_factory: PizzaIngredientFactory) -> Pizza:
+    pizza = VeggiePizza(ingredient_factory=ingredient_factory)
+    pizza.set_name("Chicago Style Veggie Pizza")
+    return pizza
+
+
+class ChicagoPizzaStore(PizzaStore):
+    ingredient_factory: PizzaIngredientFactory = ChicagoPizzaIngredientFactory()
+
+    @classmethod
+    def create_pizza(cls, pizza_type: str) -> Pizza:
+        return chicago_pizzas.create(pizza_type=pizza_type, ingredient_factory=cls.ingredient_factory)
 
 
 if __name__ == '__main__':
@@ -251,3 +439,39 @@ if __name__ == '__main__':
     pizza_store = NYPizzaStore()
     delivery_pizza = pizza_store.order_pizza(pizza_type="cheese")
     print(delivery_pizza.sauce)
+
+    # the pizzas share the same (stateless) ingredients, whereas the ingredients which opt out are made per pizza
+    assert NYPizzaStore.order_pizza(pizza_type="veggie").sauce is delivery_pizza.sauce
+
+    class GardenVeggies(Veggies):
+        shared = False
+
+    assert NYPizzaIngredientFactory.get_ingredient(GardenVeggies) is not NYPizzaIngredientFactory.get_ingredient(
+        GardenVeggies)
+    garden_pizza = create_ny_veggie_pizza(ingredient_factory=NYPizzaStore.ingredient_factory)
+    garden_pizza.veggies = NYPizzaIngredientFactory.get_ingredient(GardenVeggies)
+    assert garden_pizza.clone().veggies is not garden_pizza.veggies
+
+    # the next cheese pizzas are clones of the first one: they are not prepared again, but get the same ingredients
+    cloned_pizza = NYPizzaStore.order_pizza(pizza_type="cheese")
+    assert cloned_pizza is not delivery_pizza and cloned_pizza.dough is delivery_pizza.dough
+
+    # after a change of ingredient factory, the pizzas are prepared again, with the new ingredients
+    regular_ingredient_factory = NYPizzaStore.ingredient_factory
+    NYPizzaStore.set_ingredient_factory(ChicagoPizzaIngredientFactory())
+    assert isinstance(NYPizzaStore.order_pizza(pizza_type="cheese").dough, ThickCrustDough)
+    NYPizzaStore.set_ingredient_factory(regular_ingredient_factory)
+
+    # as well as after a direct assignment, or in a store which inherits the ingredient factory
+    class BrooklynPizzaStore(NYPizzaStore):
+        pass
+
+    assert isinstance(BrooklynPizzaStore.order_pizza(pizza_type="cheese").dough, ThinCrustDough)
+    NYPizzaStore.set_ingredient_factory(ChicagoPizzaIngredientFactory())
+    assert isinstance(BrooklynPizzaStore.order_pizza(pizza_type="cheese").dough, ThickCrustDough)
+    NYPizzaStore.ingredient_factory = regular_ingredient_factory
+    assert isinstance(NYPizzaStore.order_pizza(pizza_type="cheese").dough, ThinCrustDough)
+    assert isinstance(BrooklynPizzaStore.order_pizza(pizza_type="cheese").dough, ThinCrustDough)
+
+    # the same pizza types, made with the ingredients of Chicago
+    assert isinstance(ChicagoPizzaStore.order_pizza(pizza_type="clam").clams, FrozenClams)
@@ -0,0 +1,185 @@
+# Benchmarks for the pizza stores and factories of this chapter.
+
+import contextlib
+import importlib
+import os
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+import abstract_factory
+import factory_method
+from pizza_registry import PizzaRegistry
+
+
+def _menu(type_count: int) -> list:
+    return [f"pizza_{number}" for number in range(type_count)]
+
+
+def _if_elif_chain(pizza_types: list):
+    """A `create_pizza` written as an if/elif chain over `pizza_types`, as the stores used to be."""
+    lines = ["def create_pizza(pizza_type):"]
+    for number, pizza_type in enumerate(pizza_types):
+        lines.append(f"    {'if' if number == 0 else 'elif'} pizza_type == {pizza_type!r}:")
+        lines.append(f"        return {number}")
+    lines.append("    raise ValueError(f'Pizza type {pizza_type} is not supported.')")
+    namespace: dict = {}
+    exec("\n".join(lines), namespace)
+    return namespace["create_pizza"]
+
+
+def benchmark_dispatch(type_counts=(4, 100, 500), order_count: int = 100_000) -> None:
+    """Compares the time to find what creates a pizza type, with an if/elif chain and with a registry,
+    for orders spread uniformly over a menu of `type_count` pizza types."""
+    for type_count in type_counts:
+        pizza_types = _menu(type_count=type_count)
+        orders = [pizza_types[number % type_count] for number in range(order_count)]
+        chain = _if_elif_chain(pizza_types=pizza_types)
+        registry = PizzaRegistry()
+        for number, pizza_type in enumerate(pizza_types):
+            registry.register(pizza_type)(lambda number=number: number)
+
+        start = perf_counter()
+        for pizza_type in orders:
+            chain(pizza_type)
+        chain_time = (perf_counter() - start) / order_count
+        start = perf_counter()
+        for pizza_type in orders:
+            registry.create(pizza_type=pizza_type)
+        registry_time = (perf_counter() - start) / order_count
+        print(f"{type_count:>4} pizza types: if/elif {chain_time * 1e9:8,.0f} ns/order, "
+              f"registry {registry_time * 1e9:8,.0f} ns/order")
+
+
+def benchmark_cold_start(type_count: int = 300) -> None:
+    """Compares starting a store whose menu of `type_count` pizza types lives in as many modules, importing every
+    module at startup, and registering them lazily (only the pizza types which are ordered get imported)."""
+    with tempfile.TemporaryDirectory() as directory:
+        for number in range(type_count):
+            with open(os.path.join(directory, f"menu_pizza_{number}.py"), "w") as file:
+                file.write(f"class Pizza{number}:\n    name = 'Pizza {number}'\n")
+        sys.path.insert(0, directory)
+        try:
+            results = {}
+            for name in ("eager", "lazy"):
+                importlib.invalidate_caches()
+                for number in range(type_count):
+                    sys.modules.pop(f"menu_pizza_{number}", None)
+                registry = PizzaRegistry()
+                start = perf_counter()
+                for number in range(type_count):
+                    if name == "eager":
+                        module = importlib.import_module(f"menu_pizza_{number}")
+                        registry.register(f"pizza_{number}")(getattr(module, f"Pizza{number}"))
+                    else:
+                        registry.register_lazy(f"pizza_{number}", f"menu_pizza_{number}:Pizza{number}")
+                startup = perf_counter() - start
+                start = perf_counter()
+                registry.create(pizza_type="pizza_0")
+                results[name] = (startup, perf_counter() - start)
+        finally:
+            sys.path.remove(directory)
+    for name, (startup, first_order) in results.items():
+        print(f"{name:>5} registration of {type_count} pizza types: startup {startup * 1e3:8.2f} ms, "
+              f"first order {first_order * 1e3:6.2f} ms")
+
+
+class _UnsharedIngredientFactory(abstract_factory.NYPizzaIngredientFactory):
+    """The NY ingredients, allocated anew for every pizza (as they were before they were shared)."""
+
+    @classmethod
+    def get_ingredient(cls, ingredient_class: type) -> abstract_factory.Ingredient:
+        return ingredient_class()
+
+
+def benchmark_ingredient_allocations(order_count: int = 10_000, pizza_type: str = "pepperoni") -> None:
+    """Measures with `tracemalloc` the memory allocated per order, by pizzas which are all kept alive,
+    with a new ingredient factory and new ingredients per order, and with the shared factory and ingredients."""
+    def per_order_factory():
+        return abstract_factory.ny_pizzas.create(pizza_type=pizza_type, ingredient_factory=_UnsharedIngredientFactory())
+
+    def shared_factory():
+        return abstract_factory.NYPizzaStore.create_pizza(pizza_type=pizza_type)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        results = {}
+        for name, create_pizza in (("per order", per_order_factory), ("shared", shared_factory)):
+            create_pizza().prepare()  # the shared ingredients are created by the first order
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            pizzas = []
+            for _ in range(order_count):
+                pizza = create_pizza()
+                pizza.prepare()
+                pizzas.append(pizza)
+            statistics = tracemalloc.take_snapshot().compare_to(before, "filename")
+            tracemalloc.stop()
+            results[name] = (sum(statistic.count_diff for statistic in statistics) / order_count,
+                             sum(statistic.size_diff for statistic in statistics) / order_count)
+    for name, (blocks, size) in results.items():
+        print(f"{name:>9} ingredients: {blocks:5.2f} blocks and {size:6.1f} bytes allocated per order")
+
+
+class _UncachedNYPizzaStore(abstract_factory.NYPizzaStore):
+    """The NY store of 'abstract_factory.py', preparing every pizza it is ordered."""
+    cache_prototypes = False
+
+
+def benchmark_prototype_cache(order_count: int = 100_000,
+                              pizza_types=("cheese", "pepperoni", "clam", "veggie")) -> None:
+    """Compares the orders per second of the NY store of 'abstract_factory.py', preparing each pizza and cloning
+    prepared prototypes (the printing of the steps goes to /dev/null)."""
+    orders = [pizza_types[number % len(pizza_types)] for number in range(order_count)]
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        rates = {}
+        for name, store in (("prepared", _UncachedNYPizzaStore), ("cloned", abstract_factory.NYPizzaStore)):
+            store.invalidate_prototypes()
+            start = perf_counter()
+            for pizza_type in orders:
+                store.order_pizza(pizza_type=pizza_type)
+            rates[name] = order_count / (perf_counter() - start)
+    print(f"Orders: prepared {rates['prepared']:10,.0f} orders/s, cloned {rates['cloned']:10,.0f} orders/s")
+
+
+class _DictPizza:
+    """A pizza of 'factory_method.py' as it used to be: attributes in a `__dict__`, and a list of toppings per pizza."""
+
+    def __init__(self, name: str, dough: str, sauce: str, toppings: list):
+        self.name = name
+        self.dough = dough
+        self.sauce = sauce
+        self.toppings = toppings
+
+
+def _measure_footprint(create_pizza, count: int) -> float:
+    """The memory allocated per pizza to keep `count` pizzas (and the list holding them) alive, in bytes."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    pizzas = [create_pizza() for _ in range(count)]
+    statistics = tracemalloc.take_snapshot().compare_to(before, "filename")
+    tracemalloc.stop()
+    del pizzas
+    return sum(statistic.size_diff for statistic in statistics) / count
+
+
+def benchmark_pizza_footprint(order_count: int = 10_000_000, sample_count: int = 100_000) -> None:
+    """Measures the memory kept per order by `sample_count` NY cheese pizzas, as they used to be and with slots,
+    and the memory it amounts to for `order_count` orders. Pass `sample_count=order_count` to measure the whole day
+    instead of extrapolating (the former representation then needs several GB)."""
+    def dict_pizza():
+        return _DictPizza(name="NY Style Sauce and Cheese Pizza", dough="Thin Crust", sauce="Marinara Sauce",
+                          toppings=["Grated Reggiano Cheese"])
+
+    for name, create_pizza in (("dict", dict_pizza), ("slots", factory_method.NYCheesePizza)):
+        per_order = _measure_footprint(create_pizza=create_pizza, count=sample_count)
+        print(f"{name:>5} pizzas: {per_order:6.1f} bytes per order, "
+              f"{per_order * order_count / 2 ** 20:8,.0f} MiB for {order_count:,} orders")
+
+
+if __name__ == '__main__':
+    benchmark_dispatch()
+    benchmark_cold_start()
+    benchmark_ingredient_allocations()
+    benchmark_pizza_footprint()
+    benchmark_prototype_cache()
@@ -1,16 +1,24 @@
 # In the factory method pattern, the PizzaStore interface delegates the implementation of create_pizza to a concrete
 # class (in this case, NYPizzaStore)
 
-from typing import List
+import sys
+from typing import Dict, Iterable, Optional, Tuple
+
+from kitchen_pipeline import KitchenPipeline, PipelineReport
+from pizza_registry import PizzaRegistry
 
 
 class Pizza:
+    """A day of orders is kept in memory, so a pizza is kept small: it has no `__dict__` (hence `__slots__`, which the
+    subclasses keep empty), its names are interned (every cheese pizza refers to the same strings) and its toppings
+    are an immutable tuple, which is shared by all the pizzas of a class when it is given as a literal."""
+    __slots__ = ("name", "dough", "sauce", "toppings")
 
-    def __init__(self, name: str, dough: str, sauce: str, toppings: List[str]):
-        self.name = name
-        self.dough = dough
-        self.sauce = sauce
-        self.toppings = toppings
+    def __init__(self, name: str, dough: str, sauce: str, toppings: Iterable[str]):
+        self.name = sys.intern(name)
+        self.dough = sys.intern(dough)
+        self.sauce = sys.intern(sauce)
+        self.toppings: Tuple[str, ...] = tuple(toppings)
 
     def prepare(self) -> None:
         print(f"Preparing {self.name}")
@@ -41,34 +49,59 @@ class PizzaStore:
         pizza.box()
         return pizza
 
+    @classmethod
+    def order_pizzas(cls, pizza_types: Iterable[str], workers: Optional[Dict[str, int]] = None,
+                     queue_size: int = 16) -> PipelineReport:
+        """Orders many pizzas at once: the steps of `order_pizza` become the stages of a pipeline, each with its own
+        workers (see `KitchenPipeline`). The report holds the pizzas, in order, and the throughput of the kitchen."""
+        kitchen = KitchenPipeline(create_pizza=cls.create_pizza, workers=workers, queue_size=queue_size)
+        return kitchen.run(pizza_types=pizza_types)
+
     @classmethod
     def create_pizza(cls, pizza_type: str) -> Pizza:
         raise NotImplementedError
 
 
+# the pizza types NYPizzaStore can create. The specialties are rarely ordered: their module is only imported on demand.
+ny_pizzas = PizzaRegistry()
+ny_pizzas.register_lazy(pizza_type="margherita", target="ny_specialty_pizzas:NYMargheritaPizza")
+ny_pizzas.register_lazy(pizza_type="white", target="ny_specialty_pizzas:NYWhitePizza")
+
+
+@ny_pizzas.register("cheese")
 class NYCheesePizza(Pizza):
+    __slots__ = ()
 
     def __init__(self):
         super().__init__(name="NY Style Sauce and Cheese Pizza", dough="Thin Crust", sauce="Marinara Sauce",
-                         toppings=["Grated Reggiano Cheese"])
+                         toppings=("Grated Reggiano Cheese",))
 
 
+@ny_pizzas.register("pepperoni")
 class NYPepperoniPizza(Pizza):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(name="NY Style Pepperoni Pizza", dough="Thin Crust", sauce="Marinara Sauce with Basilicum",
-                         toppings=["Grated Reggiano Cheese", "Parma Pepperoni"])
+                         toppings=("Grated Reggiano Cheese", "Parma Pepperoni"))
 
 
+@ny_pizzas.register("clam")
 class NYClamPizza(Pizza):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(name="NY Style Clam Pizza", dough="Thin Crust", sauce="Marinara Sauce with Oregano",
-                         toppings=["Grated Reggiano Cheese", "Genova Clams"])
+                         toppings=("Grated Reggiano Cheese", "Genova Clams"))
 
 
+@ny_pizzas.register("veggie")
 class NYVeggiePizza(Pizza):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(name="NY Style Veggie Pizza", dough="Thin Crust", sauce="Marinara Sauce with Oregano",
-                         toppings=["Grated Reggiano Cheese", "Neapolitan Aubergine"])
+                         toppings=("Grated Reggiano Cheese", "Neapolitan Aubergine"))
 
 
 class NYPizzaStore(PizzaStore):
@@ -76,20 +109,69 @@ class NYPizzaStore(PizzaStore):
     That is, these are fixed in the definition of the concrete Pizza instance, e.g., NYCheesePizza."""
     @classmethod
     def create_pizza(cls, pizza_type: str) -> Pizza:
-        if pizza_type == "cheese":
-            pizza = NYCheesePizza()
-        elif pizza_type == "pepperoni":
-            pizza = NYPepperoniPizza()
-        elif pizza_type == "clam":
-            pizza = NYClamPizza()
-        elif pizza_type == "veggie":
-            pizza = NYVeggiePizza()
-        else:
-            raise ValueError(f"Pizza type {pizza_type} is not supported.")
-        return pizza
+        return ny_pizzas.create(pizza_type=pizza_type)
+
+
+# the pizza types ChicagoPizzaStore can create
+chicago_pizzas = PizzaRegistry()
+
+
+class ChicagoStylePizza(Pizza):
+    """Chicago pizzas are deep dish pizzas, which are cut into squares."""
+    __slots__ = ()
+
+    def cut(self) -> None:
+        print(f"Cut {self.name} in square slices.")
+
+
+@chicago_pizzas.register("cheese")
+class ChicagoCheesePizza(ChicagoStylePizza):
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(name="Chicago Style Deep Dish Cheese Pizza", dough="Extra Thick Crust",
+                         sauce="Plum Tomato Sauce", toppings=("Shredded Mozzarella Cheese",))
+
+
+@chicago_pizzas.register("pepperoni")
+class ChicagoPepperoniPizza(ChicagoStylePizza):
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(name="Chicago Style Pepperoni Pizza", dough="Extra Thick Crust", sauce="Plum Tomato Sauce",
+                         toppings=("Shredded Mozzarella Cheese", "Sliced Pepperoni"))
+
+
+@chicago_pizzas.register("clam")
+class ChicagoClamPizza(ChicagoStylePizza):
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(name="Chicago Style Clam Pizza", dough="Extra Thick Crust", sauce="Plum Tomato Sauce",
+                         toppings=("Shredded Mozzarella Cheese", "Frozen Clams"))
+
+
+@chicago_pizzas.register("veggie")
+class ChicagoVeggiePizza(ChicagoStylePizza):
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(name="Chicago Style Veggie Pizza", dough="Extra Thick Crust", sauce="Plum Tomato Sauce",
+                         toppings=("Shredded Mozzarella Cheese", "Black Olives", "Spinach", "Eggplant"))
+
+
+class ChicagoPizzaStore(PizzaStore):
+    @classmethod
+    def create_pizza(cls, pizza_type: str) -> Pizza:
+        return chicago_pizzas.create(pizza_type=pizza_type)
 
 
 if __name__ == '__main__':
     print("Let us create a NY Pizza")
     pizza_store = NYPizzaStore()
     pizza_store.order_pizza(pizza_type="cheese")
+    # the specialties are imported the first time they are ordered
+    pizza_store.order_pizza(pizza_type="margherita")
+
+    print("Let us create a Chicago Pizza")
+    ChicagoPizzaStore().order_pizza(pizza_type="cheese")
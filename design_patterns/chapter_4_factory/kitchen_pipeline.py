@@ -0,0 +1,144 @@
+# A kitchen which works on many orders at once, for the `order_pizzas` method of the PizzaStores in 'factory_method.py'
+# and 'abstract_factory.py'. `order_pizza` takes one pizza at a time through prepare, bake, cut and box. Here, each of
+# these steps of the template is a stage of a pipeline, with its own workers (e.g., as many bakers as there are oven
+# slots) and a bounded queue of the pizzas waiting for it. While a pizza bakes, the next ones are already being
+# prepared, and a slow stage holds back the ones before it once its queue is full, instead of piling up pizzas.
+# The report tells how many pizzas per second the kitchen made, and how busy the workers of each stage were,
+# which is what is needed to size a kitchen: the stage with the highest utilization is the bottleneck.
+
+from queue import Queue
+from threading import Lock, Thread
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional
+
+STAGES = ("prepare", "bake", "cut", "box")
+
+# put in the queue of a stage to stop one of its workers
+_STOP = object()
+
+
+class PipelineReport:
+
+    def __init__(self, pizzas: list, elapsed: float, workers: Dict[str, int], busy: Dict[str, float]):
+        self.pizzas = pizzas
+        self.elapsed = elapsed
+        self.workers = workers
+        self.busy = busy
+
+    def throughput(self) -> float:
+        """The number of pizzas made per second."""
+        return len(self.pizzas) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def utilization(self, stage: str) -> float:
+        """The fraction of the time the workers of `stage` spent working, between 0 and 1."""
+        return self.busy[stage] / (self.workers[stage] * self.elapsed) if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        lines = [f"{len(self.pizzas)} pizzas in {self.elapsed:.3f}s ({self.throughput():.1f} pizzas/s)"]
+        for stage in STAGES:
+            lines.append(f"{stage:>8}: {self.workers[stage]} workers, {self.utilization(stage=stage):6.1%} utilization")
+        return "\n".join(lines)
+
+
+class KitchenPipeline:
+
+    def __init__(self, create_pizza: Callable, workers: Optional[Dict[str, int]] = None, queue_size: int = 16):
+        """`create_pizza` creates a pizza from its type (e.g., `NYPizzaStore.create_pizza`), and `workers` gives
+        the number of workers of some stages (the others have one). At most `queue_size` pizzas wait for each stage."""
+        workers = {**dict.fromkeys(STAGES, 1), **(workers or {})}
+        if set(workers) != set(STAGES):
+            raise ValueError(f"The stages of the kitchen are {', '.join(STAGES)}.")
+        if min(workers.values()) < 1 or queue_size < 1:
+            raise ValueError("Every stage needs at least one worker, and room for at least one pizza.")
+        self.create_pizza = create_pizza
+        self.workers = workers
+        self.queue_size = queue_size
+
+    def run(self, pizza_types: Iterable[str]) -> PipelineReport:
+        """Makes a pizza of each type, and returns them (in the order of `pizza_types`) with the report."""
+        queues: List[Queue] = [Queue(maxsize=self.queue_size) for _ in STAGES]
+        busy = dict.fromkeys(STAGES, 0.0)
+        finished: list = []
+        errors: List[BaseException] = []
+        lock = Lock()
+
+        def work(position: int) -> None:
+            stage = STAGES[position]
+            inbox = queues[position]
+            outbox = queues[position + 1] if position + 1 < len(STAGES) else None
+            working = 0.0
+            while True:
+                item = inbox.get()
+                if item is _STOP:
+                    break
+                index, pizza = item
+                start = perf_counter()
+                try:
+                    getattr(pizza, stage)()
+                except Exception as error:
+                    # the pizza is dropped, and the error is raised once the kitchen has stopped
+                    errors.append(error)
+                    continue
+                finally:
+                    working += perf_counter() - start
+                if outbox is None:
+                    finished.append(item)
+                else:
+                    outbox.put(item)
+            with lock:
+                busy[stage] += working
+
+        threads = [[Thread(target=work, args=(position,), name=f"kitchen-{stage}-{number}", daemon=True)
+                    for number in range(self.workers[stage])] for position, stage in enumerate(STAGES)]
+        start = perf_counter()
+        for stage_threads in threads:
+            for thread in stage_threads:
+                thread.start()
+        try:
+            for index, pizza_type in enumerate(pizza_types):
+                queues[0].put((index, self.create_pizza(pizza_type=pizza_type)))
+        finally:
+            # the stages are stopped one after the other, once the stages before them have passed on every pizza
+            for queue, stage_threads in zip(queues, threads):
+                for _ in stage_threads:
+                    queue.put(_STOP)
+                for thread in stage_threads:
+                    thread.join()
+        elapsed = perf_counter() - start
+        if errors:
+            raise errors[0]
+
+        finished.sort(key=lambda item: item[0])
+        return PipelineReport(pizzas=[pizza for _, pizza in finished], elapsed=elapsed, workers=dict(self.workers),
+                              busy=busy)
+
+
+if __name__ == '__main__':
+    import contextlib
+    import io
+    from time import sleep
+
+    from factory_method import NYCheesePizza, NYPizzaStore
+
+    class SlowOvenPizza(NYCheesePizza):
+        def bake(self) -> None:
+            sleep(0.01)
+
+    # with one oven slot, the oven is the bottleneck: the other stages wait for it
+    kitchen = KitchenPipeline(create_pizza=lambda pizza_type: SlowOvenPizza())
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = kitchen.run(pizza_types=["cheese"] * 40)
+    assert len(report.pizzas) == 40 and report.utilization("bake") > report.utilization("prepare")
+    print(report)
+
+    # with four oven slots, the same orders take about a quarter of the time
+    kitchen = KitchenPipeline(create_pizza=lambda pizza_type: SlowOvenPizza(), workers={"bake": 4})
+    with contextlib.redirect_stdout(io.StringIO()):
+        faster_report = kitchen.run(pizza_types=["cheese"] * 40)
+    assert faster_report.throughput() > 2 * report.throughput()
+    print(faster_report)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        pizzas = NYPizzaStore.order_pizzas(pizza_types=["cheese", "clam", "veggie"], workers={"bake": 2}).pizzas
+    assert [pizza.name for pizza in pizzas] == ["NY Style Sauce and Cheese Pizza", "NY Style Clam Pizza",
+                                                "NY Style Veggie Pizza"]
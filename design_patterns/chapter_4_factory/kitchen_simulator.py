@@ -0,0 +1,162 @@
+# A simulation of pizza stores under load, to plan the capacity of their kitchens.
+# `PizzaStore.order_pizza` makes one pizza at a time, and the steps only print. Here, an AsyncPizzaStore wraps one of
+# the PizzaStores of 'factory_method.py' (which still creates the pizzas), and each step takes a simulated time with
+# `asyncio.sleep`, holding one unit of the resource it needs (a counter to prepare, a slot in the oven to bake, ...).
+# Thousands of orders, across several stores, can then be in flight in a single thread. The latencies of each stage,
+# waiting for the resource included, are recorded and summarized as percentiles.
+#
+# The durations are given in simulated seconds, and the simulation runs on an event loop with a virtual clock
+# (see `VirtualClockEventLoop`): whenever every order is waiting, the clock jumps to the next timer instead of sleeping.
+# A day of orders is therefore simulated as fast as the loop can go, and the reported latencies are exact: they
+# depend neither on the host nor on the overhead of the event loop, and the clock of the loop counts simulated seconds.
+
+import asyncio
+import math
+import random
+import selectors
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from kitchen_pipeline import STAGES
+
+# the resource each stage of the kitchen needs, and how many units of it a store has by default
+STAGE_RESOURCES = {"prepare": "counter", "bake": "oven", "cut": "counter", "box": "boxing table"}
+DEFAULT_CAPACITIES = {"counter": 3, "oven": 4, "boxing table": 1}
+# the average duration of each stage, in simulated seconds
+DEFAULT_DURATIONS = {"prepare": 120.0, "bake": 600.0, "cut": 20.0, "box": 15.0}
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """The nearest-rank percentile of `values`, which must be sorted."""
+    if not values:
+        raise ValueError("There are no values.")
+    rank = max(int(-(-percent * len(values) // 100)), 1)
+    return values[rank - 1]
+
+
+class _VirtualClockSelector(selectors.DefaultSelector):
+    """A selector which polls instead of waiting for a timeout, and moves the virtual clock forward by the timeout."""
+
+    def __init__(self):
+        super().__init__()
+        self.now = 0.0
+
+    def select(self, timeout: Optional[float] = None):
+        if timeout is None:
+            # nothing is scheduled: only another thread (or the operating system) can wake the loop up
+            return super().select(timeout=None)
+        events = super().select(timeout=0)
+        if not events and timeout > 0:
+            # the clock must move, however small the timeout is compared with the time already simulated
+            self.now = max(self.now + timeout, math.nextafter(self.now, math.inf))
+        return events
+
+
+class VirtualClockEventLoop(asyncio.SelectorEventLoop):
+    """An event loop whose clock starts at 0 and only moves when the loop would otherwise wait for its next timer,
+    and then jumps to it. The timers (`asyncio.sleep`, ...) fire in the same order as on a real clock, at exactly the
+    time they were scheduled for."""
+
+    def __init__(self):
+        self._virtual_clock = _VirtualClockSelector()
+        super().__init__(selector=self._virtual_clock)
+
+    def time(self) -> float:
+        return self._virtual_clock.now
+
+
+class AsyncPizzaStore:
+
+    def __init__(self, store: type, capacities: Optional[Dict[str, int]] = None,
+                 durations: Optional[Dict[str, float]] = None, jitter: float = 0.25,
+                 seed: Optional[int] = None):
+        """`store` is the PizzaStore which creates the pizzas. The duration of each step is drawn uniformly within
+        `jitter` (a fraction) of its average duration."""
+        self.store = store
+        self.capacities = {**DEFAULT_CAPACITIES, **(capacities or {})}
+        self.durations = {**DEFAULT_DURATIONS, **(durations or {})}
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._resources = {resource: asyncio.Semaphore(capacity) for resource, capacity in self.capacities.items()}
+        # the latency of each stage, and of the whole order (under "order"), in simulated seconds
+        self.latencies: Dict[str, List[float]] = {stage: [] for stage in STAGES + ("order",)}
+
+    async def _run_stage(self, stage: str) -> None:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async with self._resources[STAGE_RESOURCES[stage]]:
+            duration = self.durations[stage] * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+            await asyncio.sleep(duration)
+        self.latencies[stage].append(loop.time() - start)
+
+    async def order_pizza(self, pizza_type: str):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        pizza = self.store.create_pizza(pizza_type=pizza_type)
+        for stage in STAGES:
+            await self._run_stage(stage=stage)
+        self.latencies["order"].append(loop.time() - start)
+        return pizza
+
+    def report(self, elapsed: float) -> str:
+        """A summary of the orders made in `elapsed` simulated seconds."""
+        orders = len(self.latencies["order"])
+        per_hour = orders / elapsed * 3600 if elapsed > 0 else 0.0
+        lines = [f"{self.store.__name__}: {orders} orders, {per_hour:.1f} orders/hour"]
+        for stage, latencies in self.latencies.items():
+            if latencies:
+                latencies = sorted(latencies)
+                lines.append(f"{stage:>8}: p50 {percentile(latencies, 50):8.1f}s, "
+                             f"p99 {percentile(latencies, 99):8.1f}s")
+        return "\n".join(lines)
+
+
+async def _make_orders(orders: List[Tuple[AsyncPizzaStore, str]]) -> float:
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await asyncio.gather(*(store.order_pizza(pizza_type=pizza_type) for store, pizza_type in orders))
+    return loop.time() - start
+
+
+def simulate(orders: Iterable[Tuple[AsyncPizzaStore, str]]) -> float:
+    """Places all the orders (a store and a pizza type) at once, on a new VirtualClockEventLoop, and returns the
+    simulated time it took to make them. The stores must take part in a single simulation (their resources belong to
+    its event loop)."""
+    orders = list(orders)
+    if not orders:
+        return 0.0
+    loop = VirtualClockEventLoop()
+    try:
+        return loop.run_until_complete(_make_orders(orders=orders))
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    from factory_method import ChicagoPizzaStore, NYPizzaStore
+
+    def simulate_day() -> Tuple[AsyncPizzaStore, AsyncPizzaStore, float]:
+        # the Chicago store has a bigger oven
+        ny_store = AsyncPizzaStore(store=NYPizzaStore, seed=0)
+        chicago_store = AsyncPizzaStore(store=ChicagoPizzaStore, capacities={"oven": 8}, seed=1)
+        generator = random.Random(2)
+        orders = [(generator.choice((ny_store, chicago_store)), generator.choice(("cheese", "pepperoni", "veggie")))
+                  for _ in range(1000)]
+        return ny_store, chicago_store, simulate(orders=orders)
+
+    ny_store, chicago_store, elapsed = simulate_day()
+    for store in (ny_store, chicago_store):
+        print(store.report(elapsed=elapsed))
+    assert len(ny_store.latencies["order"]) + len(chicago_store.latencies["order"]) == 1000
+    # with twice as many oven slots, the Chicago pizzas wait less for the oven
+    chicago_bake, ny_bake = sorted(chicago_store.latencies["bake"]), sorted(ny_store.latencies["bake"])
+    assert percentile(chicago_bake, 50) < percentile(ny_bake, 50)
+
+    # the simulation does not depend on how fast the loop runs: the same day gives the same latencies
+    same_ny_store, same_chicago_store, same_elapsed = simulate_day()
+    assert same_elapsed == elapsed
+    assert same_ny_store.latencies == ny_store.latencies and same_chicago_store.latencies == chicago_store.latencies
+
+    # and a lone order takes exactly the sum of the durations of the stages
+    lone_store = AsyncPizzaStore(store=NYPizzaStore, jitter=0.0)
+    assert simulate(orders=[(lone_store, "cheese")]) == sum(DEFAULT_DURATIONS.values())
+    assert lone_store.latencies["order"] == [sum(DEFAULT_DURATIONS.values())]
@@ -0,0 +1,20 @@
+# The rarely ordered pizzas of NYPizzaStore in 'factory_method.py'. The store registers them lazily,
+# so this module is only imported the first time one of them is ordered.
+
+from factory_method import Pizza
+
+
+class NYMargheritaPizza(Pizza):
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(name="NY Style Margherita Pizza", dough="Thin Crust", sauce="San Marzano Tomato Sauce",
+                         toppings=("Fresh Mozzarella", "Basil"))
+
+
+class NYWhitePizza(Pizza):
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(name="NY Style White Pizza", dough="Thin Crust", sauce="Garlic and Olive Oil",
+                         toppings=("Mozzarella", "Ricotta"))
@@ -0,0 +1,58 @@
+# A registry of the pizza types a store (or a factory) can create, used instead of chains of if/elif over `pizza_type`.
+# Looking up a pizza type is a single dictionary access, however many types are on the menu, and new types are added
+# by registering them, without touching `create_pizza`.
+# A pizza type can also be registered lazily, as "module:attribute": the module is only imported the first time the type
+# is ordered, so that a store does not have to import every pizza class of its menu when it starts.
+
+import importlib
+from typing import Callable, Dict, List
+
+
+class PizzaRegistry:
+
+    def __init__(self):
+        # what creates the pizza of each type (usually, the pizza class), and where to import the lazy ones from
+        self._creators: Dict[str, Callable] = {}
+        self._lazy: Dict[str, str] = {}
+
+    def register(self, pizza_type: str) -> Callable[[Callable], Callable]:
+        """A decorator which registers a pizza class (or any callable returning a pizza) under `pizza_type`."""
+        def decorator(create: Callable) -> Callable:
+            self._lazy.pop(pizza_type, None)
+            self._creators[pizza_type] = create
+            return create
+        return decorator
+
+    def register_lazy(self, pizza_type: str, target: str) -> None:
+        """Registers `pizza_type` as the attribute of a module, e.g. "ny_specialty_pizzas:NYMargheritaPizza",
+        which is only imported the first time the pizza type is resolved."""
+        if ":" not in target:
+            raise ValueError(f"The target {target} must be of the form 'module:attribute'.")
+        self._creators.pop(pizza_type, None)
+        self._lazy[pizza_type] = target
+
+    def resolve(self, pizza_type: str) -> Callable:
+        try:
+            return self._creators[pizza_type]
+        except KeyError:
+            pass
+        try:
+            module_name, attribute = self._lazy[pizza_type].split(":", 1)
+        except KeyError:
+            raise ValueError(f"Pizza type {pizza_type} is not supported.")
+        create = getattr(importlib.import_module(module_name), attribute)
+        # the next orders of this pizza type do not go through the import machinery anymore
+        self._creators[pizza_type] = create
+        self._lazy.pop(pizza_type, None)
+        return create
+
+    def create(self, pizza_type: str, **kwargs):
+        """Creates a pizza of type `pizza_type`, passing `kwargs` on to what creates it."""
+        create = self._creators.get(pizza_type) or self.resolve(pizza_type=pizza_type)
+        return create(**kwargs)
+
+    def __contains__(self, pizza_type: str) -> bool:
+        return pizza_type in self._creators or pizza_type in self._lazy
+
+    def pizza_types(self) -> List[str]:
+        return [*self._creators, *self._lazy]
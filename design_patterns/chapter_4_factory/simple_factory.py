@@ -1,41 +1,127 @@
 # In the simple factory approach, the factory is another object composed with PizzaStore.
 
+from array import array
+from threading import Lock
+from time import monotonic
+from typing import Callable, List, Optional, Tuple
+
+from pizza_registry import PizzaRegistry
+
+# the pizza types SimplePizzaFactory can create
+simple_pizzas = PizzaRegistry()
+
+# the states of an order, in the order it goes through them; an order is stored as the position of its state here
+STATES = ("Order", "Prepare", "Bake", "Cut", "Box")
+_STATE_CODES = {state: code for code, state in enumerate(STATES)}
+
+
+class OrderTracker:
+    """Tracks the status of every order, so that many orders can be in flight at once.
+    Every change of status is appended to an event log of three `array` columns (order, state code and timestamp),
+    which takes 17 bytes per event, and the current state of each order is kept in one byte. The number of orders in
+    each state is maintained as the orders change state, so that it is known in O(1) how many orders are, e.g., in the
+    oven right now."""
+
+    def __init__(self, clock: Callable[[], float] = monotonic):
+        self.clock = clock
+        self._event_orders = array("Q")
+        self._event_states = array("B")
+        self._event_timestamps = array("d")
+        self._current = array("B")
+        self._counts = [0] * len(STATES)
+        self._lock = Lock()
+
+    def _log(self, order_id: int, code: int) -> None:
+        self._event_orders.append(order_id)
+        self._event_states.append(code)
+        self._event_timestamps.append(self.clock())
+
+    def new_order(self) -> int:
+        """Registers a new order, in the first state, and returns its id."""
+        with self._lock:
+            order_id = len(self._current)
+            self._current.append(0)
+            self._counts[0] += 1
+            self._log(order_id=order_id, code=0)
+        return order_id
+
+    def advance(self, order_id: int, state: str) -> None:
+        try:
+            code = _STATE_CODES[state]
+        except KeyError:
+            raise ValueError(f"State {state} is not supported.")
+        with self._lock:
+            self._counts[self._current[order_id]] -= 1
+            self._counts[code] += 1
+            self._current[order_id] = code
+            self._log(order_id=order_id, code=code)
+
+    def status(self, order_id: int) -> str:
+        return STATES[self._current[order_id]]
+
+    def count(self, state: str) -> int:
+        """The number of orders which are in `state` right now."""
+        return self._counts[_STATE_CODES[state]]
+
+    def history(self, order_id: int) -> List[Tuple[str, float]]:
+        """The states `order_id` went through, with the time it entered them. This scans the whole event log."""
+        with self._lock:
+            return [(STATES[code], timestamp) for order, code, timestamp in
+                    zip(self._event_orders, self._event_states, self._event_timestamps) if order == order_id]
+
+    def __len__(self) -> int:
+        """The number of orders tracked."""
+        return len(self._current)
+
+
+# the tracker of the pizzas which are not given one
+order_tracker = OrderTracker()
+
+
 class Pizza:
-    status: str = "Order"
+    """The status belongs to each pizza (an order), and is kept by the order tracker."""
 
-    @classmethod
-    def prepare(cls) -> None:
+    def __init__(self, tracker: Optional[OrderTracker] = None):
+        self.tracker = tracker if tracker is not None else order_tracker
+        self.order_id = self.tracker.new_order()
+
+    @property
+    def status(self) -> str:
+        return self.tracker.status(order_id=self.order_id)
+
+    def prepare(self) -> None:
         print("Pizza is being prepared.")
-        cls.status = "Prepare"
+        self.tracker.advance(order_id=self.order_id, state="Prepare")
 
-    @classmethod
-    def bake(cls) -> None:
+    def bake(self) -> None:
         print("Pizza is being baked.")
-        cls.status = "Bake"
+        self.tracker.advance(order_id=self.order_id, state="Bake")
 
-    @classmethod
-    def cut(cls) -> None:
+    def cut(self) -> None:
         print("Pizza is being cut.")
-        cls.status = "Cut"
+        self.tracker.advance(order_id=self.order_id, state="Cut")
 
-    @classmethod
-    def box(cls) -> None:
+    def box(self) -> None:
         print("Pizza is being boxed.")
-        cls.status = "Box"
+        self.tracker.advance(order_id=self.order_id, state="Box")
 
 
+@simple_pizzas.register("cheese")
 class CheesePizza(Pizza):
     pass
 
 
+@simple_pizzas.register("pepperoni")
 class PepperoniPizza(Pizza):
     pass
 
 
+@simple_pizzas.register("clam")
 class ClamPizza(Pizza):
     pass
 
 
+@simple_pizzas.register("veggie")
 class VeggiePizza(Pizza):
     pass
 
@@ -43,29 +129,20 @@ class VeggiePizza(Pizza):
 class SimplePizzaFactory:
 
     @classmethod
-    def create_pizza(cls, pizza_type: str) -> Pizza:
-        if pizza_type == "cheese":
-            pizza = CheesePizza()
-        elif pizza_type == "pepperoni":
-            pizza = PepperoniPizza()
-        elif pizza_type == "clam":
-            pizza = ClamPizza()
-        elif pizza_type == "veggie":
-            pizza = VeggiePizza()
-        else:
-            raise ValueError(f"Pizza type {pizza_type} is not supported.")
-        return pizza
+    def create_pizza(cls, pizza_type: str, tracker: Optional[OrderTracker] = None) -> Pizza:
+        return simple_pizzas.create(pizza_type=pizza_type, tracker=tracker)
 
 
 class PizzaStore:
     """
     Implementation using SimplePizzaFactory. Here the factory (SimplePizzaFactory) is composed with PizzaStore.
     """
-    def __init__(self, factory: SimplePizzaFactory):
+    def __init__(self, factory: SimplePizzaFactory, tracker: Optional[OrderTracker] = None):
         self.factory = factory
+        self.tracker = tracker if tracker is not None else order_tracker
 
     def order_pizza(self, pizza_type: str) -> Pizza:
-        pizza = self.factory.create_pizza(pizza_type=pizza_type)
+        pizza = self.factory.create_pizza(pizza_type=pizza_type, tracker=self.tracker)
 
         pizza.prepare()
         print(pizza.status)
@@ -87,3 +164,14 @@ if __name__ == '__main__':
 
     pizza_store = PizzaStore(factory=SimplePizzaFactory())
     order = pizza_store.order_pizza(pizza_type="clam")
+
+    # each order has its own status: the first order has not been prepared yet, while the clam pizza is boxed
+    assert (first_order.status, order.status) == ("Order", "Box")
+    assert (order_tracker.count("Order"), order_tracker.count("Box")) == (1, 1)
+    assert [state for state, _ in order_tracker.history(order_id=order.order_id)] == list(STATES)
+
+    # a store (and its pizzas) can keep its own tracker, even while it is still empty
+    own_tracker = OrderTracker()
+    own_store = PizzaStore(factory=SimplePizzaFactory(), tracker=own_tracker)
+    assert own_store.tracker is own_tracker and own_store.order_pizza(pizza_type="veggie").tracker is own_tracker
+    assert own_tracker.count("Box") == 1 and order_tracker.count("Box") == 1
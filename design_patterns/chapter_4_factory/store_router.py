@@ -0,0 +1,171 @@
+# A router which spreads the orders over several processes, for when a single store cannot keep up.
+# Each shard is a process of its own (a ProcessPoolExecutor with a single worker), which imports the stores of
+# 'abstract_factory.py' and therefore holds its own ingredient factories, flyweights and prototypes. The orders are
+# partitioned over a consistent hash ring: all the orders with the same key go to the same shard (whose caches are then
+# warm for them, and which makes them in order), and adding or removing a shard only moves the keys of about 1/n of the
+# ring. The shards send back compact records (named tuples), not the pizzas.
+# The key is the region and the pizza type by default. Partitioning by region only is coarser: with two regions, at
+# most two shards get any work, and all the orders of a region are made by a single shard.
+
+import bisect
+import hashlib
+import os
+import sys
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import count
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+import abstract_factory
+
+# the store of each region, in the shards
+REGIONS = {"NY": abstract_factory.NYPizzaStore, "Chicago": abstract_factory.ChicagoPizzaStore}
+INGREDIENTS = ("dough", "sauce", "cheese", "veggies", "pepperoni", "clams")
+# the key of an order on the ring, from its region and pizza type, for each way of partitioning the orders
+PARTITION_KEYS = {
+    "region:pizza_type": lambda region, pizza_type: f"{region}:{pizza_type}",
+    "region": lambda region, pizza_type: region,
+    "pizza_type": lambda region, pizza_type: pizza_type,
+}
+
+
+class OrderRecord(NamedTuple):
+    region: str
+    pizza_type: str
+    name: str
+    # the names of the ingredient classes of the pizza, in the order of INGREDIENTS (empty if it has none of them)
+    ingredients: Tuple[str, ...]
+    # the process id of the shard which made the pizza
+    worker: int
+
+
+class HashRing:
+    """A consistent hash ring. Each node is placed at `replicas` points of the ring, and a key belongs to the first
+    node found clockwise from the hash of the key."""
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 128):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._nodes: List[str] = []
+        for node in nodes:
+            self.add(node=node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+    def add(self, node: str) -> None:
+        for replica in range(self.replicas):
+            point = self._hash(f"{node}#{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._nodes.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        kept = [(point, kept_node) for point, kept_node in zip(self._points, self._nodes) if kept_node != node]
+        self._points = [point for point, _ in kept]
+        self._nodes = [kept_node for _, kept_node in kept]
+
+    def node_for(self, key: str) -> str:
+        if not self._points:
+            raise ValueError("The ring has no nodes.")
+        index = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        return self._nodes[index]
+
+
+def _start_shard() -> None:
+    # the stores print every step, which nobody reads in a shard
+    sys.stdout = open(os.devnull, "w")
+
+
+def _make_order(region: str, pizza_type: str) -> OrderRecord:
+    pizza = REGIONS[region].order_pizza(pizza_type=pizza_type)
+    ingredients = tuple(type(pizza.__dict__[ingredient]).__name__ if ingredient in pizza.__dict__ else ""
+                        for ingredient in INGREDIENTS)
+    return OrderRecord(region=region, pizza_type=pizza_type, name=pizza.get_name(), ingredients=ingredients,
+                       worker=os.getpid())
+
+
+class StoreRouter:
+
+    def __init__(self, shard_count: int = 4, partition_by: str = "region:pizza_type", replicas: int = 128):
+        if partition_by not in PARTITION_KEYS:
+            raise ValueError(f"The orders can be partitioned by {', '.join(PARTITION_KEYS)}.")
+        self.partition_by = partition_by
+        self.ring = HashRing(replicas=replicas)
+        self.shards: Dict[str, ProcessPoolExecutor] = {}
+        self._shard_names = count()
+        for _ in range(shard_count):
+            self.add_shard()
+
+    def add_shard(self) -> str:
+        """Starts a new shard, which takes over about 1/n of the keys from the others, and returns its name."""
+        name = f"shard-{next(self._shard_names)}"
+        self.shards[name] = ProcessPoolExecutor(max_workers=1, initializer=_start_shard)
+        self.ring.add(node=name)
+        return name
+
+    def remove_shard(self, name: str) -> None:
+        """Stops sending orders to the shard `name`, and stops it once it has made the orders it was sent."""
+        self.ring.remove(node=name)
+        self.shards.pop(name).shutdown(wait=True)
+
+    def shard_for(self, region: str, pizza_type: str) -> str:
+        return self.ring.node_for(key=PARTITION_KEYS[self.partition_by](region, pizza_type))
+
+    def submit(self, region: str, pizza_type: str) -> Future:
+        if region not in REGIONS:
+            raise ValueError(f"Region {region} is not supported.")
+        shard = self.shards[self.shard_for(region=region, pizza_type=pizza_type)]
+        return shard.submit(_make_order, region, pizza_type)
+
+    def order_pizza(self, region: str, pizza_type: str) -> OrderRecord:
+        return self.submit(region=region, pizza_type=pizza_type).result()
+
+    def order_pizzas(self, orders: Iterable[Tuple[str, str]]) -> List[OrderRecord]:
+        """Sends all the orders (a region and a pizza type) to their shards, and returns their records in order."""
+        futures = [self.submit(region=region, pizza_type=pizza_type) for region, pizza_type in orders]
+        return [future.result() for future in futures]
+
+    def shutdown(self) -> None:
+        for executor in self.shards.values():
+            executor.shutdown(wait=True)
+        self.shards.clear()
+
+    def __enter__(self) -> "StoreRouter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+
+if __name__ == '__main__':
+    # adding a node to the ring only moves the keys which the new node takes over
+    keys = [f"key-{number}" for number in range(10_000)]
+    ring = HashRing(nodes=[f"shard-{number}" for number in range(4)])
+    before = {key: ring.node_for(key) for key in keys}
+    ring.add(node="shard-4")
+    moved = [key for key in keys if ring.node_for(key) != before[key]]
+    assert all(ring.node_for(key) == "shard-4" for key in moved) and len(moved) < 0.35 * len(keys)
+
+    with StoreRouter(shard_count=3, partition_by="pizza_type") as router:
+        orders = [(region, pizza_type) for region in REGIONS
+                  for pizza_type in ("cheese", "pepperoni", "clam", "veggie")]
+        records = router.order_pizzas(orders=orders * 10)
+        assert [(record.region, record.pizza_type) for record in records] == orders * 10
+        assert records[0].name == "NY Style Cheese Pizza" and records[0].ingredients[0] == "ThinCrustDough"
+        # all the pizzas of a type are made by the same shard
+        workers = {}
+        for record in records:
+            assert workers.setdefault(record.pizza_type, record.worker) == record.worker
+        print(f"{len(records)} pizzas made by {len(set(workers.values()))} of {len(router.shards)} shards")
+
+        # a new shard takes over some of the pizza types, and the orders keep coming back in order
+        router.add_shard()
+        assert [(record.region, record.pizza_type) for record in router.order_pizzas(orders=orders)] == orders
+
+    # by default, the orders of a single region are spread over several shards
+    with StoreRouter(shard_count=3) as router:
+        ny_orders = [("NY", pizza_type) for pizza_type in ("cheese", "pepperoni", "clam", "veggie")]
+        records = router.order_pizzas(orders=ny_orders * 10)
+        assert len({record.worker for record in records}) > 1
+        print(f"{len(records)} NY pizzas made by {len({record.worker for record in records})} shards")
@@ -0,0 +1,58 @@
+# Benchmarks for the thread-safe singleton in 'singleton_thread_safe.py'.
+
+from threading import Barrier, Lock, Thread
+from time import perf_counter
+
+from singleton_thread_safe import SingletonMeta
+
+
+class GlobalLockSingletonMeta(type):
+    """SingletonMeta as it used to be: every call takes one lock, shared by all the singleton classes."""
+    _instances = {}
+    _lock: Lock = Lock()
+
+    def __call__(cls, *args, **kwargs):
+        with cls._lock:
+            if cls not in cls._instances:
+                instance = super().__call__(*args, **kwargs)
+                cls._instances[cls] = instance
+        return cls._instances[cls]
+
+
+class GlobalLockSingleton(metaclass=GlobalLockSingletonMeta):
+    def __init__(self, value: str):
+        self.value = value
+
+
+class DoubleCheckedSingleton(metaclass=SingletonMeta):
+    def __init__(self, value: str):
+        self.value = value
+
+
+def benchmark_access(thread_counts=(1, 4, 32), calls_per_thread: int = 100_000) -> None:
+    """Compares the calls per second to an existing singleton, from `thread_count` threads calling it in a loop."""
+    for thread_count in thread_counts:
+        rates = {}
+        for name, singleton_class in (("global lock", GlobalLockSingleton), ("double-checked", DoubleCheckedSingleton)):
+            singleton_class(value="first")
+            barrier = Barrier(thread_count + 1)
+
+            def call() -> None:
+                barrier.wait()
+                for _ in range(calls_per_thread):
+                    singleton_class(value="ignored")
+
+            threads = [Thread(target=call) for _ in range(thread_count)]
+            for thread in threads:
+                thread.start()
+            barrier.wait()
+            start = perf_counter()
+            for thread in threads:
+                thread.join()
+            rates[name] = thread_count * calls_per_thread / (perf_counter() - start)
+        print(f"{thread_count:>3} threads: global lock {rates['global lock']:12,.0f} calls/s, "
+              f"double-checked {rates['double-checked']:12,.0f} calls/s")
+
+
+if __name__ == '__main__':
+    benchmark_access()
@@ -1,16 +1,26 @@
-from threading import Lock, Thread
+from threading import Event, Lock, Thread
 
 
 class SingletonMeta(type):
+    """Double-checked locking: once the instance exists, it is returned without taking any lock, and the lock is only
+    taken (and the instance looked up again under it) while the instance may still have to be created.
+    Each class gets its own lock when it is created, so creating the instance of one singleton class does not block
+    the callers of another one."""
     _instances = {}
-    _lock: Lock = Lock()
+
+    def __init__(cls, name, bases, namespace, **kwargs):
+        super().__init__(name, bases, namespace, **kwargs)
+        cls._lock: Lock = Lock()
 
     def __call__(cls, *args, **kwargs):
-        with cls._lock:
-            if cls not in cls._instances:
-                instance = super().__call__(*args, **kwargs)
-                cls._instances[cls] = instance
-        return cls._instances[cls]
+        instance = cls._instances.get(cls)
+        if instance is None:
+            with cls._lock:
+                instance = cls._instances.get(cls)
+                if instance is None:
+                    instance = super().__call__(*args, **kwargs)
+                    cls._instances[cls] = instance
+        return instance
 
 
 class Singleton(metaclass=SingletonMeta):
@@ -32,3 +42,21 @@ if __name__ == '__main__':
 
     process_1.start()  # prints 'First_value'
     process_2.start()  # also prints 'First_value'
+    process_1.join()
+    process_2.join()
+
+    # while one singleton class is being created, the other singleton classes can still be called
+    creating = Event()
+    created = Event()
+
+    class SlowSingleton(metaclass=SingletonMeta):
+        def __init__(self):
+            creating.set()
+            created.wait(timeout=5)
+
+    slow_process = Thread(target=SlowSingleton)
+    slow_process.start()
+    creating.wait(timeout=5)
+    assert Singleton(value="Not printed either").value == "First_value"
+    created.set()
+    slow_process.join()